@@ -1,30 +1,42 @@
 import tkinter as tk
-import threading
 import time
 import os
-import numpy as np
-import wave
-import pygame
+import queue
 import math
 
-from io import BytesIO
 from datetime import datetime, timedelta
-from pydexcom import Dexcom
 from settings import settings
-
-# Initialize tkinter root and canvas globally
-root = tk.Tk()
-root.geometry(settings.WINDOW_SIZE)
-root.configure(bg=settings.COLORS['background'])
-
-# Canvas for glucose symbol - global scope
+import metrics
+from fetcher import FetchPool, GlucoseFetcher, classify_error
+from accounts import load_accounts
+from backoff import CircuitBreaker
+from clock import SystemClock
+from startup import StartupTimer, resolve_font_families
+from ticker import Ticker
+
+# numpy, pygame and pydexcom are imported where they are first needed, so
+# the clock is on screen before they load
+
+# Tkinter root and canvas for glucose symbol - global scope, created by create_root()
+root = None
+canvas = None
 canvas_size = 300
-canvas = tk.Canvas(root, width=canvas_size, height=canvas_size, bg=settings.COLORS['background'], highlightthickness=0)
-canvas.place(x=250, y=70)
 bloodSugar = 0 
 trend = 0  
 
 
+def create_root():
+    """Create the Tk root window and the global glucose canvas."""
+    global root, canvas
+    root = tk.Tk()
+    root.geometry(settings.WINDOW_SIZE)
+    root.configure(bg=settings.COLORS['background'])
+
+    canvas = tk.Canvas(root, width=canvas_size, height=canvas_size, bg=settings.COLORS['background'], highlightthickness=0)
+    canvas.place(x=250, y=70)
+    return root
+
+
 def get_glucose_text_color(value):
    if value < settings.LOW_GLUCOSE_THRESHOLD:
         return settings.COLORS['gloucose_low_text'] 
@@ -41,294 +53,567 @@ def get_glucose_color(value):
     else:
         return settings.COLORS['gloucose_high']  
 
-def draw_glucose_symbol(glucose_value=None, trend_value=None):
-   
-    global bloodSugar, trend
-    
-    # Use global values if not specified
-    if glucose_value is None:
-        glucose_value = bloodSugar
-    if trend_value is None:
-        trend_value = trend
-    
-    canvas.delete("all")
-    
-    center_x = canvas_size // 2  # 100
-    center_y = canvas_size // 2  # 100
-    radius = 75  # Reduced slightly to give more space for the triangle
-    
-    # Get color based on blood sugar value
-    fill_color = get_glucose_color(glucose_value)
-    text_color = get_glucose_text_color(glucose_value)        
-
-
-    # Draw gray border (lighter gray)
-    canvas.create_oval(
-        center_x - radius - 10, center_y - radius - 10,
-        center_x + radius + 10, center_y + radius + 10,
-        fill="#d0d0d0", outline=""
-    )
-    
-    # Draw colored circle
-    canvas.create_oval(
-        center_x - radius, center_y - radius,
-        center_x + radius, center_y + radius,
-        fill=fill_color, outline=""
-    )
-    
-    # Draw blood sugar value
-    canvas.create_text(
-        center_x, center_y - 5,
-        text=f"{glucose_value:.1f}",
-        font=("Arial", 48, "bold"),
-        fill=text_color
-    )
-    
-    # Draw mmol/L text
-    canvas.create_text(
-        center_x, center_y + 30,
-        text="mmol/L",
-        font=("Arial", 14),
-        fill=text_color
-    )
-    
-    # Draw trend triangle - AFTER everything else so it's on top
-    # Map trend value to angle
-    trend_angles = {
-        1: -90,   # ↑↑ Rising rapidly - straight up
-        2: -60,   # ↑  Rising - angled up
-        3: -30,   # ↗  Rising slowly - slightly angled up
-        4: 0,     # →  Stable - straight to the right
-        5: 30,    # ↘  Falling slowly - slightly angled down
-        6: 60,    # ↓  Falling - angled down
-        7: 90     # ↓↓ Falling rapidly - straight down
-    }
-    
-    angle = trend_angles.get(trend_value, 0)
-    
+# Settings only read at startup, a reload cannot apply them
+RESTART_SETTINGS = {
+    'DEXCOM_CONFIG', 'FETCH_WORKERS', 'DEXCOM_CONNECT_TIMEOUT', 'DEXCOM_DEADLINE', 'WINDOW_SIZE', 'HISTORY_CAPACITY', 'CACHE_DIR',
+    'DEXCOM_SESSION_CACHE', 'FONT_CACHE', 'READING_STORE', 'BACKLIGHT_DIR',
+    'METRICS_PORT', 'METRICS_HOST', 'FANOUT_PORT', 'FANOUT_HOST', 'FANOUT_SOURCE',
+    'CONFIG_CHECK_INTERVAL', 'STATS_PANEL', 'STATS_WINDOWS',
+    'PROFILE_CALLBACKS', 'PROFILE_BUFFER', 'PROFILE_SAMPLE_SECONDS',
+    'ENGINE_MODE', 'ENGINE_STATE', 'ENGINE_WATCHDOG',
+}
+
+# Trend value to triangle direction
+TREND_ANGLES = {
+    1: -90,   # ↑↑ Rising rapidly - straight up
+    2: -60,   # ↑  Rising - angled up
+    3: -30,   # ↗  Rising slowly - slightly angled up
+    4: 0,     # →  Stable - straight to the right
+    5: 30,    # ↘  Falling slowly - slightly angled down
+    6: 60,    # ↓  Falling - angled down
+    7: 90     # ↓↓ Falling rapidly - straight down
+}
+
+
+def trend_triangle_coords(center_x, center_y, radius, angle, scale=1.0):
+    """Polygon coordinates of the trend triangle pointing at angle (degrees)."""
     # Convert to radians
     angle_rad = math.radians(angle)
-    
+
     # Place the triangle completely outside the gray border
-    triangle_distance = radius + 5  # Closer but still outside gray border
-    
+    triangle_distance = radius + 5 * scale  # Closer but still outside gray border
+
     # Calculate triangle's center position
     tri_center_x = center_x + triangle_distance * math.cos(angle_rad)
     tri_center_y = center_y + triangle_distance * math.sin(angle_rad)
-    
+
     # Larger triangle for better visibility
     # Calculate tip point (furthest from the circle)
-    tip_distance = 30
+    tip_distance = 30 * scale
     tip_x = tri_center_x + tip_distance * math.cos(angle_rad)
     tip_y = tri_center_y + tip_distance * math.sin(angle_rad)
-    
+
     # Calculate base points (closer to the circle)
-    base_width = 20
+    base_width = 20 * scale
     base_angle = angle_rad + math.pi / 2  # 90 degrees perpendicular to the direction
-    
+
     base1_x = tri_center_x + base_width * math.cos(base_angle)
     base1_y = tri_center_y + base_width * math.sin(base_angle)
-    
+
     base2_x = tri_center_x - base_width * math.cos(base_angle)
     base2_y = tri_center_y - base_width * math.sin(base_angle)
-    
-    # Draw triangle with black color and thick white border for maximum visibility
-    canvas.create_polygon(
-        tip_x, tip_y,
-        base1_x, base1_y,
-        base2_x, base2_y,
-        fill=fill_color, outline="#d0d0d0", width=5
-    )
+
+    return (tip_x, tip_y, base1_x, base1_y, base2_x, base2_y)
+
+
+class GlucoseSymbol:
+    """Glucose circle with value and trend triangle, created once and updated in place.
+
+    Laid out for a 300 px canvas and scaled to size; name, if given, is shown
+    in the top left corner.
+    """
+
+    def __init__(self, canvas, size, name=None):
+        self.canvas = canvas
+
+        scale = size / 300
+        center_x = size // 2
+        center_y = size // 2
+        radius = 75 * scale  # Reduced slightly to give more space for the triangle
+
+        # Triangle geometry only depends on the trend, work it out once
+        self.triangles = {
+            trend_value: trend_triangle_coords(center_x, center_y, radius, angle, scale)
+            for trend_value, angle in TREND_ANGLES.items()
+        }
+
+        if name:
+            canvas.create_text(
+                4, 4, anchor='nw',
+                text=name,
+                font=("Arial", max(8, round(14 * scale))),
+                fill=settings.COLORS['text_secondary']
+            )
+
+        # Draw gray border (lighter gray)
+        self.border = canvas.create_oval(
+            center_x - radius - 10 * scale, center_y - radius - 10 * scale,
+            center_x + radius + 10 * scale, center_y + radius + 10 * scale,
+            fill="#d0d0d0", outline=""
+        )
+
+        # Colored circle
+        self.circle = canvas.create_oval(
+            center_x - radius, center_y - radius,
+            center_x + radius, center_y + radius,
+            fill="", outline=""
+        )
+
+        # Blood sugar value
+        self.value_text = canvas.create_text(
+            center_x, center_y - 5 * scale,
+            text="",
+            font=("Arial", round(48 * scale), "bold")
+        )
+
+        # mmol/L text
+        self.unit_text = canvas.create_text(
+            center_x, center_y + 30 * scale,
+            text="mmol/L",
+            font=("Arial", max(8, round(14 * scale)))
+        )
+
+        # Trend triangle - created last so it's on top
+        self.triangle = canvas.create_polygon(
+            *self.triangles[4],
+            fill="", outline="#d0d0d0", width=max(2, round(5 * scale))
+        )
+
+        self._drawn = None
+        self.value = None
+        self.trend = None
+
+    def redraw(self):
+        """Draw the current value again, e.g. after the glucose colors or thresholds changed."""
+        if self.value is not None:
+            self.draw(self.value, self.trend)
+
+    def draw_unknown(self):
+        """Gray symbol without a value or trend, for when there is no reading to show."""
+        self.canvas.itemconfig(self.circle, fill=settings.COLORS['button'])
+        self.canvas.itemconfig(self.triangle, fill="", outline="")
+        self.canvas.itemconfig(self.value_text, text="--", fill=settings.COLORS['text_primary'])
+        self.canvas.itemconfig(self.unit_text, fill=settings.COLORS['text_primary'])
+        self._drawn = None
+        self.value = None
+        self.trend = None
+
+    def draw(self, glucose_value, trend_value):
+        """Update the items that changed since the last draw."""
+        self.value = glucose_value
+        self.trend = trend_value
+        with metrics.redraw_seconds.time():
+            self._draw(glucose_value, trend_value)
+
+    def _draw(self, glucose_value, trend_value):
+        fill_color = get_glucose_color(glucose_value)
+        text_color = get_glucose_text_color(glucose_value)
+        text = f"{glucose_value:.1f}"
+        coords = self.triangles.get(trend_value, self.triangles[4])
+
+        state = (text, coords, fill_color, text_color)
+        if state == self._drawn:
+            return
+
+        drawn_text, drawn_coords, drawn_fill, drawn_text_color = self._drawn or (None, None, None, None)
+
+        if fill_color != drawn_fill:
+            self.canvas.itemconfig(self.circle, fill=fill_color)
+            self.canvas.itemconfig(self.triangle, fill=fill_color, outline="#d0d0d0")
+        if text_color != drawn_text_color:
+            self.canvas.itemconfig(self.value_text, fill=text_color)
+            self.canvas.itemconfig(self.unit_text, fill=text_color)
+        if text != drawn_text:
+            self.canvas.itemconfig(self.value_text, text=text)
+        if coords != drawn_coords:
+            self.canvas.coords(self.triangle, *coords)
+
+        self._drawn = state
+
+
+glucose_symbol = None
+
+
+def draw_glucose_symbol(glucose_value=None, trend_value=None):
+
+    global bloodSugar, trend, glucose_symbol
+
+    # Use global values if not specified
+    if glucose_value is None:
+        glucose_value = bloodSugar
+    if trend_value is None:
+        trend_value = trend
+
+    if glucose_symbol is None:
+        glucose_symbol = GlucoseSymbol(canvas, canvas_size)
+    glucose_symbol.draw(glucose_value, trend_value)
 
 
 class DigitalClock:
 
 
-    def __init__(self, root):
-        """Initialize the digital clock application."""
+    def __init__(self, root, startup_timer=None, dexcom_factory=None, clock=None, decision_log=None, role=None):
+        """Initialize the digital clock application.
+
+        dexcom_factory, if given, replaces the Dexcom login: it is called with
+        a GlucoseAccount and must return an object with
+        get_current_glucose_reading() (used by the benchmarks).
+
+        clock, if given, replaces the real time (a VirtualClock for replays),
+        and decision_log(now, message) is told every alarm decision and every
+        mute and brightness change.
+
+        role is 'standalone' (everything in one process), or with ENGINE_MODE
+        'ui' (the window, showing what the engine process publishes) or
+        'engine' (fetching and alarms without a display, see engine.py). It
+        defaults to what ENGINE_MODE asks for.
+        """
         self.root = root
+        self.role = role or ('ui' if settings.ENGINE_MODE else 'standalone')
+        self.startup_timer = startup_timer or StartupTimer()
+        self.dexcom_factory = dexcom_factory
+        self.clock = clock or SystemClock()
+        self.decision_log = decision_log
+        self._setup_profiler()
         self._setup_window()
 
         self._setup_fonts()
+        self.startup_timer.mark('fonts')
         # self._update_theme()
         self._initialize_variables()
-        self._setup_audio()
         self._setup_brightness()
 
-        # Use global canvas instead of creating new one
-        global canvas, canvas_size
-        self.canvas = canvas
-        self.canvas_size = canvas_size
-
         self._create_ui()
         
-        # Draw initial glucose symbol with default values
-        draw_glucose_symbol(5.5, 4)
-        
         self._start_updates()
+        self.startup_timer.mark('ui')
 
-    def _setup_fonts(self):
-        import tkinter.font as tkFont
-        available_fonts = tkFont.families()
-        
-        def get_font_family(preferred_fonts):
-            for font in preferred_fonts:
-                if font in available_fonts:
-                    return font
-            return preferred_fonts[-1]  # Return last as fallback
-        
-        # # Set up font families
-        # glucose_family = get_font_family(['SF Pro Display', 'Helvetica Neue', 'Helvetica', 'Arial', 'sans-serif'])
-        clock_family = get_font_family(['SF Mono', 'Monaco', 'Consolas', 'Courier New', 'monospace'])
-        ui_family = get_font_family(['SF Pro Text', 'Helvetica Neue', 'Helvetica', 'Arial', 'sans-serif'])
-        
-        # # Create font tuples - adjusted for 800x480 display
-        # self.glucose_font = (glucose_family, 90, 'normal')  # Smaller for compact display
-        self.clock_font = (clock_family, 64, 'normal')     # Proportionally smaller
-        # self.trend_font = (glucose_family, 36, 'normal')   # Reduced
-        # self.info_font = (ui_family, 14, 'normal')         # Smaller
-        # self.countdown_font = (ui_family, 12, 'normal')    # Smaller
-        self.button_font = (ui_family, 16, 'bold')       # Smaller buttons
+        # Get the clock on screen before the slow parts of startup
+        self.root.update()
+        self.startup_timer.mark('first frame')
+        self.root.after(0, self._finish_startup)
+
+    def _setup_profiler(self):
+        """Time every Tk callback if PROFILE_CALLBACKS is set."""
+        if not settings.PROFILE_CALLBACKS:
+            return
+
+        from profiler import CallbackProfiler
+        CallbackProfiler(settings.PROFILE_BUFFER, settings.PROFILE_SAMPLE_SECONDS).install(self.root)
+        print(f"Profiling Tk callbacks: kill -USR1 {os.getpid()} for a summary, kill -USR2 {os.getpid()} for a sampling profile")
+
+    def _finish_startup(self):
+        """Set up audio, history and the Dexcom fetcher once the clock is showing."""
+        if self.role == 'ui' and self._start_engine():
+            # The engine sounds the alarms
+            self.startup_timer.mark('engine')
+        else:
+            self._setup_audio()
+            self.startup_timer.mark('audio')
+
+        from history import GlucoseHistory
+        from stats import RollingStats
+        for account in self.accounts:
+            account.history = GlucoseHistory(settings.HISTORY_CAPACITY)
+            account.stats = {
+                name: RollingStats(window, settings.LOW_GLUCOSE_THRESHOLD, settings.HIGH_GLUCOSE_THRESHOLD)
+                for name, window in settings.STATS_WINDOWS
+            }
+        self.startup_timer.mark('history')
+
+        self._warm_start()
+        self.startup_timer.mark('store')
 
-    def _create_ui(self):
-        self._create_control_buttons()
-        self._create_glucose_info_label()
-        self._create_clock_display()
-        
         # Initialize Dexcom connection
         self._init_dexcom()
+        self.startup_timer.mark('dexcom')
 
+        self._init_metrics()
+        self._init_fanout()
 
-    def _create_glucose_info_label(self):
-        """Create label for glucose info, countdown and connection status."""
-        self.glucose_info_label = tk.Label(
-            self.root,
-            text="",
-            font=('Arial', 14, 'normal'),
-            bg=settings.COLORS['background'],
-            fg=settings.COLORS['text_secondary']
-        )
-        self.glucose_info_label.place(x=350, y=320)
-        
-        # Countdown label
-        self.countdown_label = tk.Label(
-            self.root,
-            text="",
-            font=('Arial', 12, 'normal'),
-            bg=settings.COLORS['background'],
-            fg=settings.COLORS['text_secondary']
-        )
-        self.countdown_label.place(x=50, y=200)
+        self.startup_timer.report()
 
-    def _test_low_sound(self):
-        if self.low_sound:
-            self.low_sound.play()
-    
-    def _test_high_sound(self):
-        if self.high_sound:
-                self.high_sound.play()
-    
-    def _toggle_mute(self):
-        if self.muted_until and datetime.now() < self.muted_until:
-            self.muted_until = None
-            self.mute_button.config(text="🔇 Mute", bg=settings.COLORS['button'])
-        else:
-            self.muted_until = datetime.now() + timedelta(seconds=settings.MUTE_DURATION)
-            self.mute_button.config(bg=settings.COLORS['button_muted'])
+    def _warm_start(self):
+        """Show each account's last stored reading with its true age and refill its history and statistics."""
+        global bloodSugar, trend
+        from store import ReadingStore
 
-    def _init_dexcom(self):
-        """Initialize Dexcom connection."""
         try:
-            self.dexcom = Dexcom(
-                username=settings.DEXCOM_CONFIG['username'],
-                password=settings.DEXCOM_CONFIG['password'],
-                region=settings.DEXCOM_CONFIG['region']
-            )
-            print("Dexcom connection established")
+            self.store = ReadingStore(settings.READING_STORE)
         except Exception as e:
-            print(f"Error during Dexcom initialization: {e}")
-            self.glucose_info_label.config(text=f"Dexcom error {e}")
+            print(f"Error opening reading store: {e}")
+            return
 
-    def _generate_tone(self, frequency, duration):
+        longest_stats = max((window for _, window in settings.STATS_WINDOWS), default=0)
+        since = self.clock.time() - max(settings.HISTORY_CAPACITY * settings.SENSOR_INTERVAL, longest_stats)
+        for account in self.accounts:
+            for ts, mmol, trend_value in self.store.range(account.name, since):
+                account.history.append(ts, mmol, trend_value)
+                for stats in account.stats.values():
+                    stats.add(ts, mmol)
+            self._update_stats_panel(account)
+
+            last = self.store.latest(account.name)
+            if last is None:
+                continue
+
+            # Display only: alarms wait for a fresh reading from Dexcom
+            ts, mmol, trend_value = last
+            account.symbol.draw(mmol, trend_value)
+            account.reading_time = ts
+            account.info_label.config(text=f"Stored reading from {datetime.fromtimestamp(ts):%H:%M}")
+            if account.index == 0:
+                bloodSugar = mmol
+                trend = trend_value
 
-        sample_rate = 22050
-        samples = int(sample_rate * duration)
-        waves = np.sin(2 * np.pi * frequency * np.arange(samples) / sample_rate)
+        self._update_countdown()
+
+    def _start_engine(self):
+        """Map the engine's shared state, starting the engine if none is running.
 
-        # Convert to 16-bit
-        waves = (waves * 32767).astype(np.int16)
+        Returns False, and runs everything in this process instead, if there
+        are more accounts than the shared state holds.
+        """
+        from engine import EngineReader, SharedState, accounts_fit, start_supervisor
 
-        # Create stereo signal
-        stereo_waves = np.array([waves, waves]).T
+        if not accounts_fit(len(self.accounts)):
+            print("Fetching and sounding alarms in this process instead")
+            self.role = 'standalone'
+            return False
 
-        # Create WAV file in memory
-        wav_file = BytesIO()
-        with wave.open(wav_file, 'wb') as wav:
-            wav.setnchannels(2)
-            wav.setsampwidth(2)
-            wav.setframerate(sample_rate)
-            wav.writeframes(stereo_waves.tobytes())
+        self.engine = SharedState(settings.ENGINE_STATE)
+        self.engine_reader = EngineReader(self.engine)
+        self._engine_started_at = time.monotonic()
+        if not self.engine.alive(settings.ENGINE_WATCHDOG):
+            print("Starting the alarm engine")
+            start_supervisor()
+        self.ticker.add(self._check_engine, 1)
+        return True
+
+    def _check_engine(self):
+        """Follow the engine's mute, and warn and restart it when it stops publishing."""
+        state = self.engine.read()
+        now = time.monotonic()
+        if state is None or now - state['heartbeat'] >= settings.ENGINE_WATCHDOG:
+            self._engine_down = True
+            for account in self.accounts:
+                account.info_label.config(text="Alarm engine not running")
+            # A second supervisor exits at once, so starting one too many is harmless
+            if now - self._engine_started_at >= settings.ENGINE_WATCHDOG:
+                print("Alarm engine not responding, starting it")
+                self._engine_started_at = now
+                from engine import start_supervisor
+                start_supervisor()
+            return
+        if self._engine_down:
+            self._engine_down = False
+            for account in self.accounts:
+                account.info_label.config(text="")
+
+        # Until the engine has seen a mute from here, the button shows what was asked
+        if now - self._mute_requested_at < 2:
+            return
+        muted_until = datetime.fromtimestamp(state['muted_until']) if state['muted_until'] else None
+        if muted_until != self.muted_until and (muted_until is None or self.clock.now() < muted_until):
+            self.muted_until = muted_until
+            self._update_mute_button()
+            if muted_until is None:
+                self.mute_button.config(text="🔇 Mute", bg=settings.COLORS['button'])
+
+    def _init_metrics(self):
+        """Serve Prometheus metrics on METRICS_PORT, if set."""
+        metrics.reading_age_seconds.collect = lambda: [
+            ({'account': account.name}, round(self.clock.time() - account.reading_time))
+            for account in self.accounts if account.reading_time is not None
+        ]
+        # With ENGINE_MODE the engine serves them
+        if settings.METRICS_PORT is None or self.role == 'ui':
+            return
 
-        wav_file.seek(0)
-        return pygame.mixer.Sound(wav_file)
+        try:
+            self.metrics_server = metrics.MetricsServer(settings.METRICS_PORT, settings.METRICS_HOST)
+            print(f"Serving metrics on port {self.metrics_server.port}")
+            self.startup_timer.mark('metrics')
+        except OSError as e:
+            print(f"Error starting metrics server: {e}")
+
+    def _init_fanout(self):
+        """Publish readings to other displays on FANOUT_PORT, if set."""
+        if settings.FANOUT_PORT is None or self.role == 'ui':
+            return
 
-    def _generate_rising_tone(self, start_freq, end_freq, duration):
-        """Generate a rising tone from start_freq to end_freq over duration."""
-        sample_rate = 22050
-        samples = int(sample_rate * duration)
-        t = np.arange(samples) / sample_rate
+        try:
+            from fanout import FanoutServer
+            self.fanout = FanoutServer(settings.FANOUT_PORT, settings.FANOUT_HOST, self.store, self._stats_summary)
+            print(f"Serving readings on port {self.fanout.port}")
+            self.startup_timer.mark('fanout')
+        except OSError as e:
+            print(f"Error starting fan-out server: {e}")
 
-        # Linear frequency sweep from start_freq to end_freq
-        freq_sweep = start_freq + (end_freq - start_freq) * t / duration
+    def _setup_fonts(self):
+        # Resolved families are cached, walking tkFont.families() is slow on a Pi
+        families = resolve_font_families({
+            # 'glucose': ['SF Pro Display', 'Helvetica Neue', 'Helvetica', 'Arial', 'sans-serif'],
+            'clock': ['SF Mono', 'Monaco', 'Consolas', 'Courier New', 'monospace'],
+            'ui': ['SF Pro Text', 'Helvetica Neue', 'Helvetica', 'Arial', 'sans-serif'],
+        }, settings.FONT_CACHE)
+        clock_family = families['clock']
+        ui_family = families['ui']
+        
+        # # Create font tuples - adjusted for 800x480 display
+        # self.glucose_font = (glucose_family, 90, 'normal')  # Smaller for compact display
+        self.clock_font = (clock_family, 64, 'normal')     # Proportionally smaller
+        # self.trend_font = (glucose_family, 36, 'normal')   # Reduced
+        # self.info_font = (ui_family, 14, 'normal')         # Smaller
+        # self.countdown_font = (ui_family, 12, 'normal')    # Smaller
+        self.button_font = (ui_family, 16, 'bold')       # Smaller buttons
 
-        # Generate wave with sweeping frequency
-        waves = np.sin(2 * np.pi * np.cumsum(freq_sweep) / sample_rate)
+    def _create_ui(self):
+        self._create_control_buttons()
+        self._create_glucose_displays()
+        self._create_clock_display()
 
-        # Convert to 16-bit
-        waves = (waves * 32767).astype(np.int16)
 
-        # Create stereo signal
-        stereo_waves = np.array([waves, waves]).T
+    def _create_glucose_displays(self):
+        """Create glucose symbol, info and countdown labels for each account."""
+        global glucose_symbol
+        multiple = len(self.accounts) > 1
 
-        # Create WAV file in memory
-        wav_file = BytesIO()
-        with wave.open(wav_file, 'wb') as wav:
-            wav.setnchannels(2)
-            wav.setsampwidth(2)
-            wav.setframerate(sample_rate)
-            wav.writeframes(stereo_waves.tobytes())
+        for account, (x, y, size) in zip(self.accounts, self._glucose_cells()):
+            if account.index == 0:
+                # First account uses the global canvas
+                account.canvas = canvas
+                account.canvas.config(width=size, height=size)
+            else:
+                account.canvas = tk.Canvas(self.root, width=size, height=size, bg=settings.COLORS['background'], highlightthickness=0)
+            account.canvas.place(x=x, y=y)
+
+            account.symbol = GlucoseSymbol(account.canvas, size, account.name if multiple else None)
+            if account.index == 0:
+                glucose_symbol = account.symbol
+
+            # Label for glucose info and connection status
+            account.info_label = tk.Label(
+                self.root,
+                text="",
+                font=('Arial', 11 if multiple else 14, 'normal'),
+                bg=settings.COLORS['background'],
+                fg=settings.COLORS['text_secondary']
+            )
 
-        wav_file.seek(0)
-        return pygame.mixer.Sound(wav_file)
+            # Countdown label
+            account.countdown_label = tk.Label(
+                self.root,
+                text="",
+                font=('Arial', 10 if multiple else 12, 'normal'),
+                bg=settings.COLORS['background'],
+                fg=settings.COLORS['text_secondary']
+            )
 
-    def _generate_falling_tone(self, start_freq, end_freq, duration):
-        """Generate a falling tone from start_freq to end_freq over duration."""
-        sample_rate = 22050
-        samples = int(sample_rate * duration)
-        t = np.arange(samples) / sample_rate
+            if multiple:
+                account.info_label.place(x=x, y=y + size)
+                account.countdown_label.place(x=x, y=y + size + 20)
+            else:
+                account.info_label.place(x=350, y=320)
+                account.countdown_label.place(x=50, y=200)
+
+            # Optional time in range and variability panel
+            if settings.STATS_PANEL:
+                account.stats_label = tk.Label(
+                    self.root,
+                    text="",
+                    font=('Arial', 10, 'normal'),
+                    justify=tk.LEFT,
+                    bg=settings.COLORS['background'],
+                    fg=settings.COLORS['text_secondary']
+                )
+                if multiple:
+                    account.stats_label.place(x=x, y=y + size + 40)
+                else:
+                    account.stats_label.place(x=560, y=80)
+
+            # No reading yet, never show a made-up value
+            account.symbol.draw_unknown()
+
+    def _glucose_cells(self):
+        """(x, y, size) of each account's glucose canvas, in a grid between the buttons and the clock."""
+        count = len(self.accounts)
+        if count == 1:
+            return [(250, 70, canvas_size)]
+
+        width = int(settings.WINDOW_SIZE.split('x')[0])
+        rows = 1 if count <= 3 else 2
+        cols = math.ceil(count / rows)
+        cell_width = width // cols
+        cell_height = 280 // rows
+        size = min(cell_width - 10, cell_height - 40)  # Room for the labels below
+
+        cells = []
+        for i in range(count):
+            row, col = divmod(i, cols)
+            cells.append((col * cell_width + (cell_width - size) // 2, 60 + row * cell_height, size))
+        return cells
 
-        # Linear frequency sweep from start_freq to end_freq
-        freq_sweep = start_freq + (end_freq - start_freq) * t / duration
+    def _test_low_sound(self):
+        if self.engine:
+            self.engine.request('test_low')
+        elif self.audio:
+            self.audio.play('low')
+    
+    def _test_high_sound(self):
+        if self.engine:
+            self.engine.request('test_high')
+        elif self.audio:
+            self.audio.play('high')
+    
+    def _toggle_mute(self):
+        if self.muted_until and self.clock.now() < self.muted_until:
+            self._set_mute(None)
+        else:
+            self._set_mute(self.clock.now() + timedelta(seconds=settings.MUTE_DURATION))
 
-        # Generate wave with sweeping frequency
-        waves = np.sin(2 * np.pi * np.cumsum(freq_sweep) / sample_rate)
+    def _set_mute(self, until):
+        """Mute alarms until the datetime until, or unmute with None."""
+        if self.engine:
+            self.engine.request_mute(until.timestamp() if until else 0)
+            self._mute_requested_at = time.monotonic()
 
-        # Convert to 16-bit
-        waves = (waves * 32767).astype(np.int16)
+        self.muted_until = until
+        if until is None:
+            self.mute_button.config(text="🔇 Mute", bg=settings.COLORS['button'])
+            self._log_decision("unmuted")
+        else:
+            self.mute_button.config(bg=settings.COLORS['button_muted'])
+            self._log_decision(f"muted until {self.muted_until:%H:%M:%S}")
+            self._stop_alarm()
+            # The mute countdown shows seconds
+            self.ticker.refresh()
 
-        # Create stereo signal
-        stereo_waves = np.array([waves, waves]).T
+        # Unmuting may sound an alarm right away, muting moves the next check to the mute expiry
+        self._check_alarms()
 
-        # Create WAV file in memory
-        wav_file = BytesIO()
-        with wave.open(wav_file, 'wb') as wav:
-            wav.setnchannels(2)
-            wav.setsampwidth(2)
-            wav.setframerate(sample_rate)
-            wav.writeframes(stereo_waves.tobytes())
+    def _init_dexcom(self):
+        """Start a background fetcher per account; they connect to their glucose source on worker threads."""
+        # Accounts are fetched concurrently, up to FETCH_WORKERS at a time
+        self.fetch_pool = FetchPool(min(len(self.accounts), settings.FETCH_WORKERS))
+
+        for account in self.accounts:
+            def connect(account=account):
+                # Runs on a fetcher thread, so pydexcom is imported there too
+                if self.dexcom_factory:
+                    return self.dexcom_factory(account)
+                if self.engine:
+                    # The window shows the readings the engine fetched
+                    from engine import SharedStateSource
+                    return SharedStateSource(account.name, self.engine_reader)
+
+                from sources import make_source
+                return make_source(account)
+
+            account.fetcher = GlucoseFetcher(account.name, connect, self.fetch_pool, self.fetch_results, self._wake_for_reading)
+            self._schedule_poll(account, 0)
+        self.root.bind('<<GlucoseReading>>', self._on_pushed_reading)
+
+    def _wake_for_reading(self):
+        """Get the Tk loop to apply a pushed reading; called on the source's thread."""
+        try:
+            self.root.event_generate('<<GlucoseReading>>', when='tail')
+        except (RuntimeError, tk.TclError):
+            pass  # The loop has stopped, the app is exiting
 
-        wav_file.seek(0)
-        return pygame.mixer.Sound(wav_file)
+    def _on_pushed_reading(self, event):
+        if not self._polling_fetchers:
+            self._poll_fetcher()
 
     def _create_clock_display(self):
         """Create the elegant digital clock display."""
@@ -374,104 +659,110 @@ class DigitalClock:
 
     def _setup_brightness(self):
         """Setup brightness control for Raspberry Pi."""
-        self.current_brightness = 1.0
-        self.brightness_path = "/sys/class/backlight/rpi_backlight/brightness"
-        self.max_brightness_path = "/sys/class/backlight/rpi_backlight/max_brightness"
-        
-        # Try to read max brightness
-        try:
-            with open(self.max_brightness_path, 'r') as f:
-                self.max_brightness = int(f.read().strip())
-                print(f"Max brightness: {self.max_brightness}")
-        except:
-            # Default for official 7" touchscreen
-            self.max_brightness = 255
-            print(f"Using default max brightness: {self.max_brightness}")
-        
+        from backlight import Backlight
+
+        self.current_brightness = None
+        # The window owns the screen, the engine has none
+        self.backlight = Backlight(settings.BACKLIGHT_DIR) if self.role != 'engine' else None
         self._update_brightness()
 
     def _is_night_time(self):
         """Check if current time is within night period for dimming."""
-        now = datetime.now()
+        now = self.clock.now()
         current_time = now.hour * 60 + now.minute
         
         # Check if we're in the night period (after 22:30 or before 07:00)
         return current_time >= settings.DIM_START_TIME or current_time < settings.DIM_END_TIME
 
-    def _set_backlight_brightness(self, brightness_percent):
-        """Set the backlight brightness on Raspberry Pi."""
-        try:
-            # Calculate actual brightness value
-            brightness_value = int(self.max_brightness * brightness_percent)
-            brightness_value = max(1, brightness_value)  # Ensure minimum brightness of 1
-            
-            # Write to backlight control
-            with open(self.brightness_path, 'w') as f:
-                f.write(str(brightness_value))
-            return True
-        except PermissionError:
-            print("Permission denied: Run with sudo or add user to video group")
-            print("Run: sudo usermod -a -G video $USER")
-            return False
-        except FileNotFoundError:
-            print(f"Backlight control not found at {self.brightness_path}")
-            return False
-        except Exception as e:
-            print(f"Error setting brightness: {e}")
-            return False
-
     def _update_brightness(self):
-        """Update screen brightness based on time of day."""
+        """Update screen brightness based on time of day, ramping between day and night."""
         target_brightness = settings.BRIGHTNESS_NIGHT if self._is_night_time() else settings.BRIGHTNESS_DAY
         
         if self.current_brightness != target_brightness:
+            # Jump straight to the right level at startup
+            duration = settings.BRIGHTNESS_RAMP_TIME if self.current_brightness is not None else 0
             self.current_brightness = target_brightness
             
             # Set backlight brightness on Pi
-            if self._set_backlight_brightness(self.current_brightness):
+            if self.backlight and self.backlight.available:
+                self.backlight.set(self.current_brightness, self.clock.delay(duration))
                 print(f"Brightness adjusted to {int(self.current_brightness * 100)}%")
-        
-        # Check brightness every minute
-        self.root.after(60000, self._update_brightness)
+            self._log_decision(f"brightness {int(self.current_brightness * 100)}%")
 
     def _setup_audio(self):
+        """Start the audio engine; it sets up the mixer and loads the tones on its own thread."""
+        from audio import AudioEngine
 
-        # Initialize pygame mixer with different settings for Raspberry Pi
-        pygame.mixer.pre_init(frequency=22050, size=-16, channels=2, buffer=1024)
-        pygame.mixer.init()
-            
-        # Check if audio system is working
-        print(f"Audio driver: {pygame.mixer.get_init()}")
-        print(f"Mixer initialized: {pygame.mixer.get_init() is not None}")
-            
-        # Test audio device
-        import os
-        print(f"ALSA PCM: {os.environ.get('ALSA_PCM_CARD', 'Not set')}")
-        print(f"ALSA CTL: {os.environ.get('ALSA_CTL_CARD', 'Not set')}")
-            
-        self.low_sound = self._generate_falling_tone(settings.LOW_TONE_FREQ, settings.LOW_TONE_FREQ - 200, settings.TONE_DURATION)
-        self.high_sound = self._generate_rising_tone(settings.HIGH_TONE_FREQ, settings.HIGH_TONE_FREQ + 200, settings.TONE_DURATION)
-            
-        if self.low_sound and self.high_sound:
-           print("Audio tones generated successfully")
-        else:
-           print("Warning: Audio tones could not be generated")
+        self.audio = AudioEngine(
+            os.path.join(settings.CACHE_DIR, 'tones'), self._alarm_tones(),
+            settings.ALARM_START_VOLUME, settings.ALARM_VOLUME_STEP
+        )
+
+    def _alarm_tones(self):
+        """Alarm sound name -> (frequency, sweep, duration) from the settings."""
+        return {
+            'low': (settings.LOW_TONE_FREQ, -200, settings.TONE_DURATION),
+            'high': (settings.HIGH_TONE_FREQ, 200, settings.TONE_DURATION),
+            'predicted_low': (settings.PREDICTED_LOW_TONE_FREQ, -150, settings.TONE_DURATION),
+        }
+
+    def _stats_summary(self):
+        """{account name: {window name: statistics}} for the fan-out server's /stats."""
+        now = self.clock.time()
+        return {
+            account.name: {name: stats.summary(now) for name, stats in account.stats.items()}
+            for account in self.accounts
+        }
+
+    def _update_stats_panel(self, account=None):
+        """Show time in range and variability, for all accounts if none is given."""
+        now = self.clock.time()
+        compact = len(self.accounts) > 1
+        for account in [account] if account else self.accounts:
+            if account.stats_label is None:
+                continue  # No panel was built at startup
+            lines = []
+            for name, stats in account.stats.items():
+                summary = stats.summary(now)
+                if summary is None:
+                    continue
+                if compact:
+                    lines.append(f"{name} TIR {summary['in_range']:.0f}% GMI {summary['gmi']}% CV {summary['cv']:.0f}%")
+                else:
+                    lines.append(f"{name}: {summary['in_range']:.0f}% in range ({summary['low']:.0f}% low, {summary['high']:.0f}% high)")
+                    lines.append(f"   mean {summary['mean']} mmol/L, GMI {summary['gmi']}% ({summary['gmi_mmol_mol']} mmol/mol), CV {summary['cv']:.0f}%")
+            account.stats_label.config(text="\n".join(lines))
 
     def _update_countdown(self):
-        """Update countdown display showing seconds until next glucose update."""
-        self.reading_seconds_old += 1
-        if self.countdown_seconds > 0:
-            self.countdown_label.config(text=f"last measure:{self.reading_seconds_old}\rNext update:{self.countdown_seconds}")
-            self.countdown_seconds -= 1
-        elif self.countdown_seconds == 0:
-            self.countdown_label.config(text="Updating...")
-            self._update_glucose();
-        
-        if self.reading_seconds_old > 300 and self.countdown_seconds > 30:
-            self.countdown_seconds  = 30 #
-    
-        # Update every second
-        self.root.after(1000, self._update_countdown)
+        """Update countdown displays showing time until next glucose update."""
+        for account in self.accounts:
+            self._update_account_countdown(account)
+
+    def _update_account_countdown(self, account):
+        now = self.clock.time()
+        if account.reading_time is not None:
+            account.reading_seconds_old = round(now - account.reading_time)
+
+        if account.fetcher and account.fetcher.busy:
+            account.countdown_label.config(text="Updating...")
+        elif account.next_poll_at is not None:
+            countdown_seconds = max(0, round(account.next_poll_at - now))
+            if self.ticker.slow:
+                # Ticking once a minute, seconds would be stale
+                account.countdown_label.config(text=f"last measure:{account.reading_seconds_old // 60} min\rNext update:{countdown_seconds // 60} min")
+            else:
+                account.countdown_label.config(text=f"last measure:{account.reading_seconds_old}\rNext update:{countdown_seconds}")
+
+    def _schedule_poll(self, account, delay):
+        """Fetch a new reading for account in delay seconds."""
+        if account.poll_timer:
+            self.root.after_cancel(account.poll_timer)
+        account.next_poll_at = self.clock.time() + delay
+        account.poll_timer = self._after(delay, self._update_glucose, account)
+
+    def _after(self, seconds, func, *args):
+        """root.after() counting seconds on the clock, which a replay runs faster."""
+        return self.root.after(max(0, math.ceil(self.clock.delay(seconds) * 1000)), func, *args)
 
     def _create_control_buttons(self):
         """Create the top control bar with elegant, minimalist buttons."""
@@ -528,13 +819,25 @@ class DigitalClock:
     def _exit_app(self):
         """Exit the application."""
         try:
-            # Stop any playing sounds
-            if hasattr(self, 'low_sound') and self.low_sound:
-                self.low_sound.stop()
-            if hasattr(self, 'high_sound') and self.high_sound:
-                self.high_sound.stop()
-            # Quit pygame mixer
-            pygame.mixer.quit()
+            if self.engine:
+                # Closing the window is closing the clock, alarms included
+                self.engine.request('stop')
+            if self.fetch_pool:
+                self.fetch_pool.stop()
+            for account in self.accounts:
+                if account.fetcher:
+                    account.fetcher.stop()
+            if self.metrics_server:
+                self.metrics_server.stop()
+            if self.fanout:
+                self.fanout.stop()
+            if self.backlight:
+                self.backlight.stop()
+            if self.store:
+                self.store.close()
+            # Stop any playing sounds and quit pygame mixer
+            if self.audio:
+                self.audio.close()
         except:
             pass
         finally:
@@ -547,18 +850,28 @@ class DigitalClock:
 
     def _initialize_variables(self):
 
-        # Dexcom variables
-        self.dexcom = None
-        self.last_glucose = None
-        self.last_trend = None
-        self.last_update_time = None
-        self.countdown_seconds = settings.UPDATE_INTERVAL
-        self.reading_seconds_old = 0
+        # Dexcom variables, readings and alarm state are kept per account
+        self.accounts = load_accounts(settings.DEXCOM_CONFIG)
+        self.accounts_by_name = {account.name: account for account in self.accounts}
+        self.fetch_pool = None
+        self.fetch_results = queue.Queue()
+        self.metrics_server = None
+        self.store = None
+        self.fanout = None
+        self.engine = None  # SharedState of the engine process, in the 'ui' role
+        self.engine_reader = None
+        self._engine_started_at = 0
+        self._engine_down = False
+        self._mute_requested_at = 0
+        self._polling_fetchers = False
+
+        # Audio variables, set up after the first frame
+        self.audio = None
 
         # Alarm variables
         self.muted_until = None
-        self.last_alarm_time = None
         self.alarm_active = False
+        self._alarm_timer = None
 
     def _create_modern_button(self, parent, text, command, bg_color, padx=10):
         """Create modern, flat buttons with subtle styling."""
@@ -581,7 +894,7 @@ class DigitalClock:
         def on_enter(e):
             button.configure(bg=settings.COLORS['button_hover'])
         def on_leave(e):
-            if text == "🔇 Mute" and self.muted_until and datetime.now() < self.muted_until:
+            if text == "🔇 Mute" and self.muted_until and self.clock.now() < self.muted_until:
                 button.configure(bg=settings.COLORS['button_muted'])
             else:
                 button.configure(bg=bg_color)
@@ -591,115 +904,355 @@ class DigitalClock:
         
         return button
 
-    def _update_glucose(self):
-        """Fetch and update glucose data."""
-        
-        if not self.dexcom:
-            return
-            
+    def _update_glucose(self, account=None):
+        """Ask the background fetcher for a new glucose reading, for all accounts if none is given."""
+        if self.engine and account is None:
+            # Update now: the engine fetches
+            self.engine.request('update')
+        now = self.clock.time()
+        for account in [account] if account else self.accounts:
+            if not account.fetcher:
+                continue
+            if not account.breaker.allow(now):
+                # The source keeps failing, wait until the breaker lets a trial fetch through
+                delay = account.breaker.retry_in(now) or settings.RETRY_BASE
+                account.info_label.config(text=f"{account.source_name} unavailable, retrying at {datetime.fromtimestamp(now + delay):%H:%M}")
+                self._schedule_poll(account, delay)
+                continue
+            if account.fetcher.request():
+                account.countdown_label.config(text="Updating...")
+
+        if not self._polling_fetchers:
+            self._poll_fetcher()
+
+    def _poll_fetcher(self):
+        """Apply finished fetcher results on the Tk thread while a fetch is in flight; pushed readings wake it."""
+        # Check before draining: a fetcher posts its result before it stops being busy
+        busy = any(account.fetcher and account.fetcher.busy for account in self.accounts)
         try:
-            # Get latest glucose reading
-            bg = self.dexcom.get_current_glucose_reading()
-            
-            if bg:
-                # Store values
+            while True:
+                try:
+                    name, kind, result = self.fetch_results.get_nowait()
+                except queue.Empty:
+                    break
+                account = self.accounts_by_name[name]
+                try:
+                    if kind == 'reading':
+                        self._fetch_succeeded(account)
+                        self._apply_glucose(account, result)
+                    else:
+                        self._fetch_failed(account, kind, result)
+                except Exception as e:
+                    # Never leave the account without a next poll
+                    print(f"Error handling the reading ({account.name}): {e}")
+                    self._schedule_poll(account, max(1, account.backoff.next_delay()))
+        finally:
+            self._polling_fetchers = busy
+            if busy:
+                self._after(0.1, self._poll_fetcher)
+
+    def _fetch_succeeded(self, account):
+        account.backoff.reset()
+        if account.breaker.state != CircuitBreaker.CLOSED:
+            print(f"{account.source_name} is answering again ({account.name})")
+            self._set_circuit_metric(account, 0)
+        account.breaker.success()
+
+    def _fetch_failed(self, account, kind, error):
+        """Show a failed fetch and retry it with backoff; an outage opens the breaker for all accounts on that source."""
+        cause = classify_error(error)
+        if kind == 'connect_error':
+            print(f"Error during {account.source_name} initialization ({account.name}, {cause}): {error}")
+        else:
+            print(f"Error fetching blood sugar ({account.name}, {cause}): {error}")
+
+        if cause == 'auth':
+            # The source answered, but retrying a rejected login soon can lock the account
+            account.breaker.success()
+            account.info_label.config(text=f"{account.source_name} login failed")
+            delay = settings.RETRY_CAP
+        else:
+            account.info_label.config(text=f"{account.source_name} error {error}" if kind == 'connect_error' else "Connection error")
+            delay = account.backoff.next_delay()
+            if account.breaker.failure(self.clock.time()):
+                print(f"{account.source_name} keeps failing ({account.name}), pausing its polls for {settings.BREAKER_RESET} s")
+                self._set_circuit_metric(account, 1)
+        self._schedule_poll(account, max(1, delay))
+
+    def _set_circuit_metric(self, account, value):
+        """fetch_circuit_open for every account sharing account's breaker."""
+        for other in self.accounts:
+            if other.breaker is account.breaker:
+                metrics.fetch_circuit_open.set(value, account=other.name)
+
+    def _apply_glucose(self, account, bg):
+        """Show a reading returned by the fetcher."""
+        if bg:
+            # Store values
+            account.last_glucose = bg.mmol_l
+            account.last_mg_dl = bg.value
+            account.last_trend = bg.trend
+            account.last_update_time = self.clock.now(bg.datetime.tzinfo)
+            if account.index == 0:
                 global bloodSugar, trend
-                self.last_glucose = bg.mmol_l
-                self.last_trend = bg.trend
-                self.last_update_time = datetime.now(bg.datetime.tzinfo)
                 bloodSugar = bg.mmol_l
                 trend = bg.trend
-                
-                # Update display
-                draw_glucose_symbol(bg.mmol_l, bg.trend)
-                
-                # Subtract using tz-aware datetime
-                when = (datetime.now(bg.datetime.tzinfo) - bg.datetime).total_seconds() 
-
-                self.glucose_info_label.config(text="")
-                self.reading_seconds_old = round(when)
-
-                # Reset countdown
-                self.countdown_seconds = settings.UPDATE_INTERVAL
-                
-                    
-        except Exception as e:
-            print(f"Error fetching blood sugar: {e}")
-            self.glucose_info_label.config(text="Connection error")
-            # Retry sooner on error
-            self.countdown_seconds = 30
-    
-   
+            if account.history.append(int(bg.datetime.timestamp()), bg.mmol_l, bg.trend):
+                # With ENGINE_MODE the engine stores the readings
+                if self.store and self.role != 'ui':
+                    self.store.add(account.name, bg.datetime.timestamp(), bg.mmol_l, bg.trend)
+                if self.fanout:
+                    self.fanout.publish(account.name, bg.json, bg.datetime.timestamp())
+                for stats in account.stats.values():
+                    stats.add(bg.datetime.timestamp(), bg.mmol_l)
+                self._update_stats_panel(account)
+
+            # Update display
+            account.symbol.draw(bg.mmol_l, bg.trend)
+
+            # Subtract using tz-aware datetime
+            when = (self.clock.now(bg.datetime.tzinfo) - bg.datetime).total_seconds()
+
+            account.info_label.config(text="")
+            account.reading_time = bg.datetime.timestamp()
+            account.reading_seconds_old = round(when)
+            self._update_prediction(account)
+
+        # Poll again just after the next sensor reading is due
+        reading_time = bg.datetime.timestamp() if bg else None
+        self._schedule_poll(account, account.poll_scheduler.next_poll(reading_time, self.clock.time()))
+
+        # A reading may need alarms or a faster tick right away
+        self._check_alarms()
+        self.ticker.refresh()
+        self._update_account_countdown(account)
+
+    def _update_prediction(self, account):
+        """Project the recent trend forward and note when it is expected to go low."""
+        from prediction import predict_low
+
+        now = self.clock.time()
+        timestamps, values, _ = account.history.since(now - settings.PREDICTION_WINDOW)
+        account.predicted_low_at = predict_low(
+            timestamps, values, now,
+            settings.LOW_GLUCOSE_THRESHOLD,
+            settings.PREDICTION_WINDOW,
+            settings.PREDICTION_HORIZON,
+            settings.PREDICTION_MIN_READINGS
+        )
+        if account.predicted_low_at:
+            low_time = datetime.fromtimestamp(account.predicted_low_at).strftime('%H:%M')
+            account.info_label.config(text=f"Predicted low at {low_time}")
+
+    def _alarm_kind(self, account):
+        """'low', 'high' or 'predicted_low' if the account's current reading calls for an alarm."""
+        if account.last_glucose is None:
+            return None
+        if account.last_glucose <= settings.LOW_GLUCOSE_THRESHOLD:
+            return 'low'
+        if account.last_glucose >= settings.HIGH_GLUCOSE_THRESHOLD:
+            return 'high'
+        if account.predicted_low_at and self.clock.time() - account.reading_time < settings.PREDICTION_WINDOW:
+            return 'predicted_low'
+        return None
 
     def _is_alarm_time(self):
         """Check if current time is within alarm period (nighttime)."""
-        now = datetime.now()
+        now = self.clock.now()
         current_time = now.hour * 60 + now.minute
         
         return current_time >= settings.ALARM_START_TIME or current_time < settings.ALARM_END_TIME
 
-    def _should_play_alarm(self):
-        """Determine if alarm should be played."""
+    def _should_play_alarm(self, account):
+        """Determine if alarm should be played for account."""
+        return self._alarm_decision(account) == 'play'
+
+    def _alarm_decision(self, account):
+        """'play', or why no alarm is played for account right now."""
+        # Check if glucose is out of range or heading low
+        if self._alarm_kind(account) is None:
+            return 'in range'
+
         if not self._is_alarm_time():
-            return False
-            
-        if self.muted_until and datetime.now() < self.muted_until:
-            return False
-            
-        if self.last_glucose is None:
-            return False
-            
-        # Check if glucose is out of range
-        out_of_range = (self.last_glucose <= settings.LOW_GLUCOSE_THRESHOLD or 
-                       self.last_glucose >= settings.HIGH_GLUCOSE_THRESHOLD)
-        
-        if not out_of_range:
-            return False
-            
+            return 'outside alarm hours'
+
+        if self.muted_until and self.clock.now() < self.muted_until:
+            return 'muted'
+
         # Check if enough time has passed since last alarm
-        if (self.last_alarm_time is None or 
-            (datetime.now() - self.last_alarm_time).total_seconds() >= settings.ALARM_INTERVAL):
-            return True
-                
-        return False
-
-    def _play_alarm(self):
-        """Play appropriate alarm sound based on glucose level."""
-        if self.last_glucose is None:
+        if (account.last_alarm_time is None or
+            (self.clock.now() - account.last_alarm_time).total_seconds() >= settings.ALARM_INTERVAL):
+            return 'play'
+
+        return 'repeat not due'
+
+    def _play_alarm(self, account):
+        """Play appropriate alarm sound based on the account's glucose level."""
+        triggered = time.perf_counter()
+        kind = self._alarm_kind(account)
+        if kind is None or not self.audio:
             return
-            
-        if self.last_glucose <= settings.LOW_GLUCOSE_THRESHOLD:
-            if self.low_sound:
-                self.low_sound.play()
-                print(f"Low glucose alarm: {self.last_glucose:.1f} mmol/L")
-        elif self.last_glucose >= settings.HIGH_GLUCOSE_THRESHOLD:
-            if self.high_sound:
-                self.high_sound.play()
-                print(f"High glucose alarm: {self.last_glucose:.1f} mmol/L")
-                
-        self.last_alarm_time = datetime.now()
+
+        # Repeats of an alarm nobody has dealt with get louder
+        if self.alarm_active:
+            self.audio.escalate()
+        self.audio.play(kind, triggered)
+        self.alarm_active = True
+
+        who = f" ({account.name})" if len(self.accounts) > 1 else ""
+        if kind == 'low':
+            print(f"Low glucose alarm{who}: {account.last_glucose:.1f} mmol/L")
+        elif kind == 'high':
+            print(f"High glucose alarm{who}: {account.last_glucose:.1f} mmol/L")
+        elif kind == 'predicted_low':
+            minutes = max(0, round((account.predicted_low_at - self.clock.time()) / 60))
+            print(f"Predicted low glucose alarm{who}: low in {minutes} min ({account.last_glucose:.1f} mmol/L)")
+
+        account.last_alarm_time = self.clock.now()
 
     def _check_alarms(self):
-        """Check and play alarms if necessary."""
-        if self._should_play_alarm():
-            # Run in separate thread to avoid blocking UI
-            thread = threading.Thread(target=self._play_alarm, daemon=True)
-            thread.start()
-            
-        # Check again in 10 seconds
-        self.root.after(10000, self._check_alarms)
+        """Check and play alarms for every account if necessary."""
+        if self.role == 'ui':
+            return
+
+        for account in self.accounts:
+            decision = self._alarm_decision(account)
+            if self.decision_log and account.last_glucose is not None:
+                kind = self._alarm_kind(account)
+                self._log_decision(f"{account.name} {account.last_glucose:.1f} mmol/L{' ' + kind if kind else ''}: {decision}")
+            if decision == 'play':
+                self._play_alarm(account)
+
+        # Back in range: the next alarm starts quiet again
+        if self.alarm_active and all(self._alarm_kind(account) is None for account in self.accounts):
+            self._stop_alarm()
+
+        self._schedule_alarm_check()
+
+    def _schedule_alarm_check(self):
+        """Check alarms again exactly when the outcome can next change without a new reading.
+
+        That is when the mute runs out, when the alarm window opens, or when an
+        alarm is due to repeat. In range nothing is scheduled; the next reading
+        checks again.
+        """
+        if self._alarm_timer:
+            self.root.after_cancel(self._alarm_timer)
+            self._alarm_timer = None
+
+        alarming = [account for account in self.accounts if self._alarm_kind(account)]
+        if not alarming:
+            return
+
+        now = self.clock.now()
+        if self.muted_until and now < self.muted_until:
+            when = self.muted_until
+        elif not self._is_alarm_time():
+            when = self._next_alarm_window_start(now)
+        else:
+            when = min(
+                account.last_alarm_time + timedelta(seconds=settings.ALARM_INTERVAL)
+                if account.last_alarm_time else now
+                for account in alarming
+            )
+
+        self._alarm_timer = self._after((when - now).total_seconds(), self._check_alarms)
+
+    def _next_alarm_window_start(self, now):
+        """The next time ALARM_START_TIME comes round after now."""
+        start = now.replace(
+            hour=settings.ALARM_START_TIME // 60, minute=settings.ALARM_START_TIME % 60,
+            second=0, microsecond=0
+        )
+        if start <= now:
+            start += timedelta(days=1)
+        return start
+
+    def _stop_alarm(self):
+        """Silence a playing alarm and reset its escalation."""
+        if self.alarm_active:
+            self._log_decision("alarm stopped")
+        self.alarm_active = False
+        if self.audio:
+            self.audio.stop()
+
+    def _log_decision(self, message):
+        if self.decision_log:
+            self.decision_log(self.clock.now(), message)
 
     def _start_updates(self):
-        """Start all periodic update functions."""
-        self._update_clock()
-        self._update_countdown()
-        self._update_mute_button()
-        self._check_alarms()
+        """Run all periodic update functions from one wall-clock aligned ticker."""
+        self.ticker = Ticker(self.root, slow_when=self._is_idle, clock=self.clock)
+        self.ticker.add(self._update_clock, 1)
+        self.ticker.add(self._update_countdown, 1)
+        self.ticker.add(self._update_mute_button, 1)
+        self.ticker.add(self._update_brightness, 60)
+        self.ticker.add(self._update_stats_panel, 60)
+        if settings.CONFIG_CHECK_INTERVAL:
+            from config import ConfigWatcher
+            self.config_watcher = ConfigWatcher(restart=RESTART_SETTINGS)
+            self.ticker.add(self._check_config, settings.CONFIG_CHECK_INTERVAL)
+        self.ticker.start()
+
+    def _check_config(self):
+        """Apply edits to the settings files without a restart."""
+        started = time.perf_counter()
+        changed = self.config_watcher.check()
+        # Startup-only settings keep their old value until a restart
+        restart = sorted(changed & RESTART_SETTINGS)
+        if restart:
+            print(f"Restart to apply: {', '.join(restart)}")
+        changed -= RESTART_SETTINGS
+        if not changed:
+            return
+
+        if changed & {'LOW_TONE_FREQ', 'HIGH_TONE_FREQ', 'PREDICTED_LOW_TONE_FREQ', 'TONE_DURATION',
+                       'ALARM_START_VOLUME', 'ALARM_VOLUME_STEP'} and self.audio:
+            self.audio.configure(self._alarm_tones(), settings.ALARM_START_VOLUME, settings.ALARM_VOLUME_STEP)
+
+        # Thresholds and colors: re-classify the readings on screen and in the statistics
+        for account in self.accounts:
+            if account.history is not None and account.last_glucose is not None:
+                self._update_prediction(account)
+            account.symbol.redraw()
+            if changed & {'LOW_GLUCOSE_THRESHOLD', 'HIGH_GLUCOSE_THRESHOLD'}:
+                for stats in account.stats.values():
+                    stats.rebuild(settings.LOW_GLUCOSE_THRESHOLD, settings.HIGH_GLUCOSE_THRESHOLD)
+        self._update_stats_panel()
+
+        if changed & {'RETRY_BASE', 'RETRY_CAP', 'BREAKER_THRESHOLD', 'BREAKER_RESET'}:
+            for account in self.accounts:
+                account.backoff.base = settings.RETRY_BASE
+                account.backoff.cap = settings.RETRY_CAP
+                account.breaker.threshold = settings.BREAKER_THRESHOLD
+                account.breaker.reset_timeout = settings.BREAKER_RESET
+
+        if changed & {'SENSOR_INTERVAL', 'SHARE_UPLOAD_DELAY', 'LATE_POLL_DELAYS', 'UPDATE_INTERVAL'}:
+            for account in self.accounts:
+                account.poll_scheduler.configure(
+                    settings.SENSOR_INTERVAL, settings.SHARE_UPLOAD_DELAY,
+                    settings.LATE_POLL_DELAYS, settings.UPDATE_INTERVAL
+                )
+
+        # Brightness and the alarm window may have moved
         self._update_brightness()
+        self._check_alarms()
+        self.ticker.refresh()
+
+        print(f"Settings reloaded in {(time.perf_counter() - started) * 1000:.1f} ms: {', '.join(sorted(changed))}")
+
+    def _is_idle(self):
+        """True at night while nothing needs per-second updates: not muted, all readings in range."""
+        if not self._is_night_time() or self.muted_until:
+            return False
+        return all(
+            account.last_glucose is not None and self._alarm_kind(account) is None
+            for account in self.accounts
+        )
 
     def _update_clock(self):
         """Update elegant digital clock display."""
-        now = datetime.now()
+        now = self.clock.now()
         
         # Update main time display
         time_str = now.strftime('%H:%M')
@@ -709,14 +1262,11 @@ class DigitalClock:
         self.hour_label.config(text=now.strftime('%H'))
         self.minute_label.config(text=now.strftime('%M'))
         self.second_label.config(text=now.strftime('%S'))
-        
-        # Update every second
-        self.root.after(1000, self._update_clock)
 
     def _update_mute_button(self):
         """Update mute button with remaining time."""
-        if self.muted_until and datetime.now() < self.muted_until:
-            remaining = self.muted_until - datetime.now()
+        if self.muted_until and self.clock.now() < self.muted_until:
+            remaining = self.muted_until - self.clock.now()
             minutes = int(remaining.total_seconds() // 60)
             seconds = int(remaining.total_seconds() % 60)
             self.mute_button.config(
@@ -726,20 +1276,91 @@ class DigitalClock:
         else:
             if self.muted_until:  # Was muted but expired
                 self.muted_until = None
+                self._log_decision("mute expired")
                 self.mute_button.config(
                     text="🔇 Mute", 
                     bg=settings.COLORS['button']
                 )
-                
-        # Update every second
-        self.root.after(1000, self._update_mute_button)
 
 
 
+def export_history(args):
+    """Write stored readings to a .npz file."""
+    from history_io import export_readings
+    from store import ReadingStore
+
+    def epoch(date):
+        return datetime.fromisoformat(date).timestamp() if date else None
+
+    store = ReadingStore(settings.READING_STORE)
+    try:
+        count = export_readings(
+            store, args.file, args.account,
+            since=epoch(args.since) or 0,
+            until=epoch(args.until) or 2**31 - 1,
+            compress=args.compress
+        )
+    finally:
+        store.close()
+    print(f"Exported {count} readings to {args.file}")
+
+
+def import_history(args):
+    """Add readings from a .npz file to the store."""
+    from history_io import import_readings
+    from store import ReadingStore
+
+    store = ReadingStore(settings.READING_STORE)
+    try:
+        count = import_readings(store, args.file, args.account)
+    finally:
+        store.close()
+    print(f"Imported {count} readings from {args.file}")
+
+
+def run_engine(args):
+    """Run the engine, or a supervisor that keeps it running."""
+    import engine
+
+    if args.no_supervise:
+        engine.run_engine()
+    else:
+        engine.supervise()
+
+
 def main():
     """Main application entry point."""
-    global root
-    app = DigitalClock(root)
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Bedside clock showing Dexcom glucose readings.")
+    commands = parser.add_subparsers(dest='command')
+
+    export_parser = commands.add_parser('export', help="write stored readings to a .npz file")
+    export_parser.add_argument('file')
+    export_parser.add_argument('--account', action='append', help="account name to export, repeatable (default: all)")
+    export_parser.add_argument('--since', help="first date or time to export, e.g. 2024-05-01")
+    export_parser.add_argument('--until', help="export readings before this date or time")
+    export_parser.add_argument('--compress', action='store_true', help="deflate the file, smaller but slower")
+    export_parser.set_defaults(run=export_history)
+
+    import_parser = commands.add_parser('import', help="add readings from a .npz file to the store")
+    import_parser.add_argument('file')
+    import_parser.add_argument('--account', help="store every reading under this account name")
+    import_parser.set_defaults(run=import_history)
+
+    engine_parser = commands.add_parser('engine', help="run the fetch and alarm engine for ENGINE_MODE, restarted when it fails")
+    engine_parser.add_argument('--no-supervise', action='store_true', help="run the engine itself, without restarting it")
+    engine_parser.set_defaults(run=run_engine)
+
+    args = parser.parse_args()
+    if args.command:
+        args.run(args)
+        return
+
+    startup_timer = StartupTimer()
+    root = create_root()
+    startup_timer.mark('tk')
+    app = DigitalClock(root, startup_timer)
     root.mainloop()
 
 if __name__ == "__main__":
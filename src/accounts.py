@@ -0,0 +1,98 @@
+import os
+
+from backoff import Backoff, CircuitBreaker
+from poll_schedule import PollScheduler
+from settings import settings
+
+
+# How status messages and logs name each kind of glucose source
+SOURCE_NAMES = {'dexcom': 'Dexcom', 'nightscout': 'Nightscout', 'file': 'Feed', 'socket': 'Feed', 'fanout': 'Fan-out server'}
+
+
+class GlucoseAccount:
+    """Readings, polling and alarm state for one monitored Dexcom account."""
+
+    def __init__(self, config, index):
+        self.config = config
+        self.index = index
+        self.name = config.get('name') or config['username']
+
+        # Dexcom variables
+        self.fetcher = None
+        self.history = None  # Created once numpy is loaded
+        self.stats = {}  # Window name -> RollingStats, created with the history
+        self.last_glucose = None
+        self.last_mg_dl = None  # The same reading as Dexcom reports it
+        self.last_trend = None
+        self.last_update_time = None
+        self.reading_time = None
+        self.reading_seconds_old = 0
+        self.next_poll_at = None
+        self.poll_timer = None
+        self.poll_scheduler = PollScheduler(
+            settings.SENSOR_INTERVAL,
+            settings.SHARE_UPLOAD_DELAY,
+            settings.LATE_POLL_DELAYS,
+            settings.UPDATE_INTERVAL
+        )
+        self.backoff = Backoff(settings.RETRY_BASE, settings.RETRY_CAP)  # Retries after failed fetches
+        self.breaker = None  # Shared by the accounts on the same source, set by load_accounts()
+
+        # Alarm variables
+        self.last_alarm_time = None
+        self.predicted_low_at = None  # Epoch time a falling trend is expected to go low
+
+        # Display, created by DigitalClock
+        self.canvas = None
+        self.symbol = None
+        self.info_label = None
+        self.countdown_label = None
+        self.stats_label = None
+
+    @property
+    def source(self):
+        """(kind, endpoint) of the account's glucose source."""
+        if settings.FANOUT_SOURCE:
+            return 'fanout', settings.FANOUT_SOURCE
+        kind = self.config.get('source', 'dexcom')
+        if kind == 'dexcom':
+            return kind, self.config.get('region')
+        return kind, self.config.get('url') or self.config.get('path')
+
+    @property
+    def source_name(self):
+        """'Dexcom', 'Nightscout', ... for status messages."""
+        kind = self.source[0]
+        return SOURCE_NAMES.get(kind, kind)
+
+    @property
+    def session_cache(self):
+        """Session cache file; the first account keeps the plain DEXCOM_SESSION_CACHE name."""
+        if self.index == 0:
+            return settings.DEXCOM_SESSION_CACHE
+        root, ext = os.path.splitext(settings.DEXCOM_SESSION_CACHE)
+        return f"{root}_{self.index}{ext}"
+
+
+def load_accounts(config):
+    """GlucoseAccounts for DEXCOM_CONFIG, which is one account dict or a list of them.
+
+    Account names (the 'name' key, or the username) must be unique. Accounts
+    on the same source (kind and endpoint) share a circuit breaker: when a
+    Dexcom region or a Nightscout site is down it is down for all of them,
+    while the other sources are still polled.
+    """
+    if isinstance(config, dict):
+        config = [config]
+    accounts = [GlucoseAccount(account, index) for index, account in enumerate(config)]
+
+    names = [account.name for account in accounts]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate Dexcom account names: {names}")
+
+    breakers = {}
+    for account in accounts:
+        if account.source not in breakers:
+            breakers[account.source] = CircuitBreaker(settings.BREAKER_THRESHOLD, settings.BREAKER_RESET)
+        account.breaker = breakers[account.source]
+    return accounts
@@ -0,0 +1,135 @@
+import os
+import queue
+import threading
+import time
+
+import metrics
+
+
+SAMPLE_RATE = 22050
+BUFFER_SIZE = 1024  # Frames, small enough to keep output latency around 50 ms
+
+
+class AudioEngine:
+    """One long-lived thread that owns the pygame mixer and the alarm sounds.
+
+    The mixer is set up and the tones are preloaded on the audio thread, and
+    the first mixer channel is reserved for alarms so nothing else can take
+    it. Everything else talks to the engine through play(), stop(),
+    escalate(), configure() and close(), which only put a command on a queue.
+    """
+
+    def __init__(self, cache_dir, tones, start_volume=1.0, volume_step=0.0):
+        """tones maps a sound name to (frequency, sweep, duration)."""
+        self.cache_dir = cache_dir
+        self.tones = tones
+        self.start_volume = start_volume
+        self.volume_step = volume_step
+        self.volume = start_volume
+        self.available = False
+        self.ready = threading.Event()
+        self._commands = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="AudioEngine", daemon=True)
+        self._thread.start()
+
+    def play(self, name, triggered=None):
+        """Play a sound on the alarm channel, replacing whatever it was playing.
+
+        triggered is the perf_counter() time the alarm was decided on; when
+        given, the time until the sound is audible is recorded.
+        """
+        self._commands.put(('play', name, triggered))
+
+    def stop(self):
+        """Silence the alarm channel and drop the volume back to start_volume."""
+        self._commands.put(('stop',))
+
+    def escalate(self):
+        """Make the following alarms one volume_step louder."""
+        self._commands.put(('escalate',))
+
+    def configure(self, tones, start_volume, volume_step):
+        """Switch to new tones and volumes; only tones whose parameters changed are rendered."""
+        self._commands.put(('configure', dict(tones), start_volume, volume_step))
+
+    def close(self):
+        """Stop playing, shut the mixer down and end the audio thread."""
+        self._commands.put(('close',))
+        self._thread.join(1)
+
+    def _run(self):
+        try:
+            self._setup()
+            self.available = True
+        except Exception as e:
+            print(f"Error initializing audio: {e}")
+        finally:
+            self.ready.set()
+
+        while True:
+            command, *args = self._commands.get()
+            if command == 'close':
+                if self.available:
+                    self.channel.stop()
+                    self.mixer.quit()
+                return
+            if not self.available:
+                continue
+            try:
+                getattr(self, '_' + command)(*args)
+            except Exception as e:
+                print(f"Audio error in {command}: {e}")
+
+    def _setup(self):
+        import pygame
+        from tones import ToneBank
+
+        # Initialize pygame mixer with different settings for Raspberry Pi
+        pygame.mixer.pre_init(frequency=SAMPLE_RATE, size=-16, channels=2, buffer=BUFFER_SIZE)
+        pygame.mixer.init()
+
+        # Check if audio system is working
+        print(f"Audio driver: {pygame.mixer.get_init()}")
+        print(f"Mixer initialized: {pygame.mixer.get_init() is not None}")
+        self.mixer = pygame.mixer
+
+        # Test audio device
+        print(f"ALSA PCM: {os.environ.get('ALSA_PCM_CARD', 'Not set')}")
+        print(f"ALSA CTL: {os.environ.get('ALSA_CTL_CARD', 'Not set')}")
+
+        # Sound reaches the speaker once the mixer buffer it was mixed into has played
+        self.output_latency = BUFFER_SIZE / pygame.mixer.get_init()[0]
+
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+
+        self.tone_bank = ToneBank(self.cache_dir)
+        self.sounds = {name: self.tone_bank.get(*tone) for name, tone in self.tones.items()}
+        print("Audio tones generated successfully")
+
+    def _play(self, name, triggered):
+        self.channel.set_volume(self.volume)
+        self.channel.play(self.sounds[name])
+        if triggered is not None:
+            metrics.alarm_latency_seconds.observe(
+                time.perf_counter() - triggered + self.output_latency, sound=name
+            )
+
+    def _stop(self):
+        self.channel.stop()
+        self.volume = self.start_volume
+
+    def _configure(self, tones, start_volume, volume_step):
+        for name, tone in tones.items():
+            if self.tones.get(name) != tone:
+                self.sounds[name] = self.tone_bank.get(*tone)
+                print(f"Audio tone {name} changed to {tone}")
+        self.tones = tones
+
+        if self.volume == self.start_volume:
+            self.volume = start_volume  # Not escalated, follow the new start
+        self.start_volume = start_volume
+        self.volume_step = volume_step
+
+    def _escalate(self):
+        self.volume = min(1.0, self.volume + self.volume_step)
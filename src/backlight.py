@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+
+
+def make_fake_backlight(directory, max_brightness=255):
+    """Create a backlight directory with brightness files, for running off a Pi."""
+    os.makedirs(directory, exist_ok=True)
+    for name in ('max_brightness', 'brightness'):
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write(f"{max_brightness}\n")
+    return directory
+
+
+class Backlight:
+    """Backlight in a sysfs directory such as /sys/class/backlight/rpi_backlight.
+
+    The brightness file is kept open and only written when the integer value
+    changes. Changes ramp linearly on a daemon thread that sleeps until the
+    next integer step, so the Tk loop never waits on the backlight.
+    """
+
+    MIN_STEP = 0.05  # Seconds between writes at most
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.available = False
+        self._fd = None
+        self._written = None
+        self._ramp = None  # (from value, to value, monotonic start, duration)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+
+        # Try to read max brightness
+        try:
+            with open(os.path.join(directory, 'max_brightness'), 'r') as f:
+                self.max_brightness = int(f.read().strip())
+                print(f"Max brightness: {self.max_brightness}")
+        except (OSError, ValueError):
+            # Default for official 7" touchscreen
+            self.max_brightness = 255
+            print(f"Using default max brightness: {self.max_brightness}")
+
+        brightness_path = os.path.join(directory, 'brightness')
+        try:
+            self._fd = os.open(brightness_path, os.O_RDWR)
+            self._written = int(os.pread(self._fd, 32, 0).strip() or 0)
+            self.available = True
+        except PermissionError:
+            print("Permission denied: Run with sudo or add user to video group")
+            print("Run: sudo usermod -a -G video $USER")
+        except FileNotFoundError:
+            print(f"Backlight control not found at {brightness_path}")
+        except (OSError, ValueError) as e:
+            print(f"Error opening backlight: {e}")
+
+        if self.available:
+            self._thread = threading.Thread(target=self._run, name="Backlight", daemon=True)
+            self._thread.start()
+
+    def value(self, fraction):
+        """Integer brightness for a fraction of max_brightness, at least 1."""
+        return max(1, int(self.max_brightness * fraction))
+
+    def set(self, fraction, duration=0):
+        """Move to fraction of max_brightness over duration seconds."""
+        if not self.available:
+            return
+        with self._lock:
+            self._ramp = (self._written, self.value(fraction), time.monotonic(), duration)
+        self._wake.set()
+
+    def stop(self):
+        """Stop ramping and close the brightness file."""
+        self._stopped = True
+        self._wake.set()
+        if self.available:
+            self._thread.join(1)
+            os.close(self._fd)
+            self.available = False
+
+    def _run(self):
+        timeout = None
+        while True:
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stopped:
+                return
+
+            with self._lock:
+                start, target, started, duration = self._ramp
+
+            elapsed = time.monotonic() - started
+            if elapsed >= duration or start == target:
+                value = target
+            else:
+                value = round(start + (target - start) * elapsed / duration)
+            self._write(value)
+
+            # Sleep until the ramp has moved on by one step, or until the next set()
+            timeout = None if value == target else max(self.MIN_STEP, duration / abs(target - start))
+
+    def _write(self, value):
+        if value == self._written:
+            return
+        try:
+            data = str(value).encode()
+            os.pwrite(self._fd, data, 0)
+            try:
+                # sysfs ignores this, a fake backlight file needs the old digits gone
+                os.ftruncate(self._fd, len(data))
+            except OSError:
+                pass
+            self._written = value
+        except OSError as e:
+            print(f"Error setting brightness: {e}")
@@ -0,0 +1,71 @@
+import random
+
+
+class Backoff:
+    """Exponential backoff with full jitter.
+
+    The n-th retry in a row waits a uniformly random time between 0 and
+    min(cap, base * 2**n), so clients that failed together do not retry
+    together.
+    """
+
+    def __init__(self, base, cap):
+        self.base = base
+        self.cap = cap
+        self.failures = 0
+
+    def next_delay(self):
+        """Seconds to wait before the next retry; each call counts one more failure."""
+        ceiling = min(self.cap, self.base * 2 ** min(self.failures, 32))
+        self.failures += 1
+        return random.uniform(0, ceiling)
+
+    def reset(self):
+        self.failures = 0
+
+
+class CircuitBreaker:
+    """Stop calling a service that keeps failing, and try it again later.
+
+    Closed, calls go ahead. threshold failures in a row open it, and calls
+    are refused for reset_timeout seconds. Then it is half-open: one trial
+    call goes ahead, and its success closes the breaker while a failure
+    opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self, now):
+        """True if a call may go ahead at the epoch time now."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and now >= self.opened_at + self.reset_timeout:
+            self.state = self.HALF_OPEN
+            return True
+        return False
+
+    def retry_in(self, now):
+        """Seconds until calls are let through again; 0 while closed or waiting on the trial call."""
+        if self.state != self.OPEN:
+            return 0
+        return max(0, self.opened_at + self.reset_timeout - now)
+
+    def success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def failure(self, now):
+        """Count a failed call; returns True if this opened the breaker."""
+        self.failures += 1
+        if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.threshold):
+            self.state = self.OPEN
+            self.opened_at = now
+            return True
+        return False
@@ -0,0 +1,217 @@
+"""Headless performance benchmark for GlucoClock.
+
+Runs the real DigitalClock against a fake Dexcom that replays recorded (or
+synthetic) readings, and reports fetch latency, time to apply a reading,
+glucose symbol redraw time, tick jitter, startup time and memory.
+
+    python benchmark.py                       # real Tk if $DISPLAY is set
+    python benchmark.py --headless            # Tk widgets stubbed out
+    python benchmark.py --readings share.json # replay readings saved from Dexcom Share
+    python benchmark.py --accounts 4          # several accounts fetched side by side
+
+Readings files hold the JSON list returned by Dexcom Share, e.g. from
+Dexcom(...)._get_glucose_readings(). The sensor cadence is shortened
+(--cadence) so a run of --seconds sees many polls.
+"""
+
+import argparse
+import json
+import math
+import os
+import resource
+import tempfile
+import time
+
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import GlucoClock
+import headless
+import profiler
+from backlight import make_fake_backlight
+from settings import settings
+
+
+class FakeDexcom:
+    """Stand-in for pydexcom.Dexcom that replays readings with a simulated network latency."""
+
+    def __init__(self, readings, cadence, latency):
+        self.readings = readings
+        self.cadence = cadence
+        self.latency = latency
+        self.started = time.time()
+
+    def get_current_glucose_reading(self):
+        from pydexcom import GlucoseReading
+
+        time.sleep(self.latency)
+
+        # A new sensor reading every cadence seconds since start
+        index = int((time.time() - self.started) // self.cadence)
+        reading = dict(self.readings[index % len(self.readings)])
+        sensor_time = self.started + index * self.cadence
+        reading['DT'] = f"Date({int(sensor_time * 1000)}+0000)"
+        return GlucoseReading(reading)
+
+
+def synthetic_readings(count=288):
+    """A day of readings swinging between about 3 and 12 mmol/L."""
+    directions = ['DoubleUp', 'SingleUp', 'FortyFiveUp', 'Flat', 'FortyFiveDown', 'SingleDown', 'DoubleDown']
+    readings = []
+    for i in range(count):
+        value = 135 + 80 * math.sin(2 * math.pi * i / 48)
+        slope = math.cos(2 * math.pi * i / 48)
+        readings.append({
+            'Value': int(value),
+            'Trend': directions[min(6, max(0, int(round(3 - 3 * slope))))],
+            'DT': 'Date(0+0000)',
+        })
+    return readings
+
+
+class Samples:
+    """Named lists of timings in seconds."""
+
+    def __init__(self):
+        self.values = {}
+
+    def add(self, name, seconds):
+        self.values.setdefault(name, []).append(seconds)
+
+    def timed(self, name, func):
+        """Wrap func so every call is timed under name."""
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(name, time.perf_counter() - started)
+        return wrapper
+
+    def report(self):
+        print(f"{'metric':<22}{'n':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for name, values in self.values.items():
+            values = sorted(values)
+            p50 = values[len(values) // 2]
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            print(f"{name:<22}{len(values):>6}{p50 * 1000:>10.2f}{p95 * 1000:>10.2f}{values[-1] * 1000:>10.2f}")
+
+
+def rss_mb():
+    """Current and peak resident set size in MB."""
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        current = float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+    return current, peak
+
+
+def run(args):
+    if args.headless or not os.environ.get('DISPLAY'):
+        print("Rendering stubbed out (no display)")
+        headless.install(GlucoClock)
+
+    # Keep caches out of the real ~/.glucoclock and speed up the sensor cadence
+    cache_dir = tempfile.mkdtemp(prefix='glucoclock-bench-')
+    settings.CACHE_DIR = cache_dir
+    settings.DEXCOM_SESSION_CACHE = os.path.join(cache_dir, 'dexcom_session.json')
+    settings.FONT_CACHE = os.path.join(cache_dir, 'fonts.json')
+    settings.READING_STORE = args.store or os.path.join(cache_dir, 'readings.sqlite3')
+    settings.BACKLIGHT_DIR = make_fake_backlight(os.path.join(cache_dir, 'backlight'))
+    settings.SENSOR_INTERVAL = args.cadence
+    settings.SHARE_UPLOAD_DELAY = min(1, args.cadence / 10)
+    settings.LATE_POLL_DELAYS = (0.5, 1)
+    settings.UPDATE_INTERVAL = args.cadence
+
+    if args.readings:
+        with open(args.readings) as f:
+            readings = json.load(f)
+    else:
+        readings = synthetic_readings()
+    settings.CONFIG_CHECK_INTERVAL = None  # A reload would undo the overrides above
+    settings.METRICS_PORT = args.metrics_port
+    settings.FANOUT_PORT = args.fanout_port
+    settings.PROFILE_CALLBACKS = args.profile
+
+    if args.accounts > 1:
+        settings.DEXCOM_CONFIG = [
+            {'name': f"Account {i + 1}", 'username': f"user{i + 1}", 'password': '', 'region': 'ous'}
+            for i in range(args.accounts)
+        ]
+
+    samples = Samples()
+    GlucoClock.GlucoseSymbol.draw = samples.timed('redraw', GlucoClock.GlucoseSymbol.draw)
+
+    startup_timer = GlucoClock.StartupTimer()
+    root = GlucoClock.create_root()
+    startup_timer.mark('tk')
+    app = GlucoClock.DigitalClock(
+        root, startup_timer,
+        dexcom_factory=lambda account: FakeDexcom(readings, args.cadence, args.latency),
+        role='standalone'
+    )
+
+    # Fetch latency: from request accepted to result applied on the UI thread
+    requested = {}
+    update_glucose = app._update_glucose
+
+    def timed_update_glucose(account=None):
+        for each in [account] if account else app.accounts:
+            if each.fetcher and not each.fetcher.busy:
+                requested[each.name] = time.perf_counter()
+        update_glucose(account)
+    app._update_glucose = timed_update_glucose
+
+    apply_glucose = samples.timed('apply reading', app._apply_glucose)
+
+    def timed_apply_glucose(account, bg):
+        if account.name in requested:
+            samples.add('fetch', time.perf_counter() - requested.pop(account.name))
+        apply_glucose(account, bg)
+    app._apply_glucose = timed_apply_glucose
+
+    app.ticker.add(lambda: samples.add('tick lateness', app.ticker.lateness), 1)
+
+    root.after(int(args.seconds * 1000), root.quit)
+    root.mainloop()
+
+    # Redraw cost in isolation, cycling through values and trends
+    for i in range(args.redraws):
+        GlucoClock.draw_glucose_symbol(3.0 + (i % 100) / 10, 1 + i % 7)
+
+    print()
+    startup_timer.report()
+    print()
+    samples.report()
+    if args.profile:
+        print()
+        profiler.active.report()
+    current, peak = rss_mb()
+    print(f"\nRSS {current:.1f} MB, peak {peak:.1f} MB")
+
+    if app.fetch_pool:
+        app.fetch_pool.stop()
+    if app.store:
+        app.store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark GlucoClock without Dexcom or a display.")
+    parser.add_argument('--seconds', type=float, default=30, help="how long to run the clock")
+    parser.add_argument('--cadence', type=float, default=5, help="seconds between fake sensor readings")
+    parser.add_argument('--latency', type=float, default=0.2, help="simulated Dexcom response time")
+    parser.add_argument('--redraws', type=int, default=1000, help="extra glucose symbol redraws to time")
+    parser.add_argument('--readings', help="JSON file of Dexcom Share readings to replay")
+    parser.add_argument('--store', help="reading store to warm start from and keep (default: a fresh one)")
+    parser.add_argument('--accounts', type=int, default=1, help="number of Dexcom accounts to monitor")
+    parser.add_argument('--fanout-port', type=int, help="serve readings to other displays while running")
+    parser.add_argument('--metrics-port', type=int, help="serve Prometheus metrics while running")
+    parser.add_argument('--profile', action='store_true', help="time every Tk callback and print them at the end")
+    parser.add_argument('--headless', action='store_true', help="stub out Tk even if a display is available")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
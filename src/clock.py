@@ -0,0 +1,38 @@
+import time
+from datetime import datetime
+
+
+class SystemClock:
+    """The real time; DigitalClock asks its clock instead of calling time.time() or datetime.now()."""
+
+    def time(self):
+        return time.time()
+
+    def now(self, tz=None):
+        return datetime.now(tz)
+
+    def delay(self, seconds):
+        """Real seconds to wait for seconds of clock time to pass."""
+        return seconds
+
+
+class VirtualClock(SystemClock):
+    """Starts at the epoch time start and runs speed times faster than real time.
+
+    Timers are scaled by delay(), so a night of readings, alarms, mutes and
+    dimming plays out in minutes or seconds.
+    """
+
+    def __init__(self, start, speed=1.0):
+        self.start = start
+        self.speed = speed
+        self._started = time.monotonic()
+
+    def time(self):
+        return self.start + (time.monotonic() - self._started) * self.speed
+
+    def now(self, tz=None):
+        return datetime.fromtimestamp(self.time(), tz)
+
+    def delay(self, seconds):
+        return seconds / self.speed
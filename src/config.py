@@ -0,0 +1,78 @@
+import importlib
+import importlib.util
+import os
+import sys
+
+
+def _public_settings(settings_class):
+    return {name: value for name, value in vars(settings_class).items() if name.isupper()}
+
+
+class ConfigWatcher:
+    """Notice edits to settings.py and settings_local.py and load them into the live settings class.
+
+    check() only stats the files, so it is cheap enough to call every few
+    seconds. On a change the settings module is re-executed (which imports
+    settings_local again) and the new values are copied onto the existing
+    settings class, so every module that did `from settings import
+    settings` sees them. Settings named in restart are only read at
+    startup; they keep their startup value and are only reported as changed.
+    """
+
+    LOCAL_MODULE = 'settings_local'
+
+    def __init__(self, settings_module='settings', restart=()):
+        self.module_name = settings_module
+        self.restart = set(restart)
+        self.paths = self._paths()
+        self._stamps = self._stat()
+
+    def _paths(self):
+        """The settings files, looked up once; searching sys.path on every check is not cheap."""
+        settings_path = sys.modules[self.module_name].__file__
+        spec = importlib.util.find_spec(self.LOCAL_MODULE)
+        if spec and spec.origin:
+            return [settings_path, spec.origin]
+        # Not created yet; it is picked up next to settings.py once it is
+        return [settings_path, os.path.join(os.path.dirname(settings_path), self.LOCAL_MODULE + '.py')]
+
+    def _stat(self):
+        stamps = {}
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                stamps[path] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                stamps[path] = None
+        return stamps
+
+    def check(self):
+        """Reload if a settings file changed. Returns the names of the settings whose value changed."""
+        stamps = self._stat()
+        if stamps == self._stamps:
+            return set()
+        self._stamps = stamps
+        return self.reload()
+
+    def reload(self):
+        """Load the settings files again; on an error the current settings are kept."""
+        module = sys.modules[self.module_name]
+        live = module.settings
+        old = _public_settings(live)
+
+        sys.modules.pop(self.LOCAL_MODULE, None)
+        try:
+            importlib.reload(module)
+            new = _public_settings(module.settings)
+        except Exception as e:
+            print(f"Error reloading settings, keeping the current ones: {e}")
+            return set()
+        finally:
+            # Keep handing out the one class everybody already holds
+            module.settings = live
+
+        changed = {name for name in old.keys() | new.keys() if old.get(name) != new.get(name)}
+        for name in changed - self.restart:
+            if name in new:
+                setattr(live, name, new[name])
+        return changed
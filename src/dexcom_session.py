@@ -0,0 +1,125 @@
+import json
+import os
+import time
+
+import requests
+import urllib3
+from pydexcom import Dexcom, valid_uuid
+
+
+class CachedDexcom(Dexcom):
+    """Dexcom client that reuses the account and session id from an earlier run.
+
+    The cached session is only trusted until Dexcom rejects it. pydexcom then
+    calls _session() again from get_glucose_readings(), which logs in for real
+    and rewrites the cache.
+
+    Requests go over one keep-alive session, and the login and every fetch
+    (with any re-login it needs) must finish within deadline seconds.
+    Connecting and each wait for data only get the time that is left, and
+    the body is read in chunks against the clock, so a hung or trickling
+    connection raises requests.Timeout instead of blocking the fetcher.
+    """
+
+    def __init__(self, cache_path, connect_timeout=5, deadline=20, **kwargs):
+        self.cache_path = cache_path
+        self._try_cache = True
+        self.connect_timeout = connect_timeout
+        self.deadline = deadline
+        self._http = requests.Session()
+        self._deadline = time.monotonic() + deadline
+        try:
+            super().__init__(**kwargs)
+        finally:
+            self._deadline = None
+
+    def get_current_glucose_reading(self):
+        self._deadline = time.monotonic() + self.deadline
+        try:
+            return super().get_current_glucose_reading()
+        finally:
+            self._deadline = None
+
+    def _post(self, endpoint, params=None, json=None):
+        """pydexcom's _post with timeouts, on the keep-alive session."""
+        deadline = self._deadline or time.monotonic() + self.deadline
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout(f"Dexcom request deadline of {self.deadline} s passed")
+
+        response = self._http.post(
+            f"{self._base_url}/{endpoint}",
+            headers={"Accept-Encoding": "application/json"},
+            params=params,
+            json={} if json is None else json,
+            timeout=(min(self.connect_timeout, remaining), remaining),
+            stream=True,
+        )
+        with response:
+            # The read timeout is per chunk; only the clock bounds a body that keeps trickling in
+            body = []
+            while True:
+                try:
+                    chunk = response.raw.read1(65536, decode_content=True)
+                except urllib3.exceptions.ReadTimeoutError as e:
+                    raise requests.ReadTimeout(e) from e
+                except urllib3.exceptions.HTTPError as e:
+                    raise requests.ConnectionError(e) from e
+                if not chunk:
+                    break
+                body.append(chunk)
+                if time.monotonic() > deadline:
+                    raise requests.Timeout(f"Dexcom request deadline of {self.deadline} s passed")
+            response._content = b''.join(body)
+        try:
+            response.raise_for_status()
+            return response.json()
+        except requests.HTTPError as http_error:
+            try:
+                error = self._handle_response(response)
+            except ValueError:
+                error = None  # Not a Dexcom error body, e.g. a proxy's HTML page
+            if error:
+                raise error from http_error
+            raise
+
+    def _session(self):
+        """Use the cached session the first time, log in on later calls."""
+        if self._try_cache:
+            self._try_cache = False
+            cached = self._load_cache()
+            if cached:
+                self._account_id = cached['account_id']
+                self._session_id = cached['session_id']
+                print("Reusing cached Dexcom session")
+                return
+
+        super()._session()
+        self._save_cache()
+
+    def _cache_key(self):
+        return {'username': self._username, 'base_url': self._base_url}
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, 'r') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if any(cached.get(k) != v for k, v in self._cache_key().items()):
+            return None
+        if not valid_uuid(cached.get('account_id')) or not valid_uuid(cached.get('session_id')):
+            return None
+        return cached
+
+    def _save_cache(self):
+        cached = dict(self._cache_key(), account_id=self._account_id, session_id=self._session_id)
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            # The session id is a credential, keep it private to this user
+            fd = os.open(self.cache_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(cached, f)
+        except OSError as e:
+            print(f"Could not cache Dexcom session: {e}")
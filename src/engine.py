@@ -0,0 +1,412 @@
+"""Run fetching and alarms in a supervised process of their own, apart from the Tk UI.
+
+With ENGINE_MODE on, `GlucoClock.py engine` runs a supervisor that keeps an
+engine process going: the clock without a display, fetching readings and
+sounding alarms. The engine publishes its state in a small mmap'd file
+(ENGINE_STATE) every second. The UI only reads that file, and
+writes mute and button requests back into it, so a wedged or restarted UI
+never holds up an alarm. The UI starts the supervisor if no engine is
+running.
+
+The file is a seqlock: the engine makes the sequence number odd, writes,
+and makes it even again, and a reader retries if the number was odd or
+changed while it copied. Python has no memory barriers to order those
+stores on ARM, so the body also carries a CRC that a reader checks.
+"""
+
+import os
+import signal
+import struct
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from backoff import Backoff
+from settings import settings
+from sources import MAX_AGE, glucose_reading
+
+
+MAGIC = b'GCE1'
+MAX_ACCOUNTS = 8
+
+# magic, sequence, CRC of the rest, then pid, account count, heartbeat, muted until, alarm active
+HEADER = struct.Struct('<4sIIiIdd?')
+# name, reading time, mg/dL as Dexcom reported it, trend, alarm kind, predicted low at, last alarm at
+SLOT = struct.Struct('<32sdHbBdd')
+# mute sequence, mute until, command sequence, command; written by the UI
+REQUESTS = struct.Struct('<IdIB')
+
+BODY_START = 12  # After magic, sequence and CRC
+STATE_END = HEADER.size + MAX_ACCOUNTS * SLOT.size
+SIZE = STATE_END + REQUESTS.size
+
+ALARM_KINDS = (None, 'low', 'high', 'predicted_low')
+COMMANDS = (None, 'stop', 'test_low', 'test_high', 'update')
+
+
+def accounts_fit(count):
+    """True if count accounts fit in the shared state; otherwise says so and returns False."""
+    if count <= MAX_ACCOUNTS:
+        return True
+    print(f"ENGINE_MODE handles at most {MAX_ACCOUNTS} accounts, DEXCOM_CONFIG has {count}")
+    return False
+
+
+class SharedState:
+    """The engine's readings and alarm state, in a file both processes map.
+
+    The engine creates it and publish()es; the UI read()s it and sends
+    requests. A UI may open it before the engine has created it, it is
+    mapped once it exists.
+    """
+
+    def __init__(self, path, create=False):
+        self.path = path
+        self.map = None
+        self._seq = 0
+        if create:
+            self._create()
+
+    def _create(self):
+        import mmap
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size != SIZE:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, SIZE)
+            self.map = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)
+        self.map[:4] = MAGIC
+        self._seq = struct.unpack_from('<I', self.map, 4)[0] & ~1
+
+    def _open(self):
+        import mmap
+
+        try:
+            fd = os.open(self.path, os.O_RDWR)
+        except FileNotFoundError:
+            return False
+        try:
+            if os.fstat(fd).st_size != SIZE:
+                return False
+            self.map = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)
+        return True
+
+    def publish(self, muted_until, alarm_active, slots):
+        """Write the state; slots are (name, reading time, mg/dL, trend, alarm kind, predicted low at, last alarm at)."""
+        body = HEADER.pack(MAGIC, 0, 0, os.getpid(), len(slots), time.monotonic(), muted_until, alarm_active)[BODY_START:]
+        for name, reading_time, mg_dl, trend, kind, predicted_low_at, last_alarm_at in slots[:MAX_ACCOUNTS]:
+            body += SLOT.pack(name.encode()[:32], reading_time, mg_dl, trend, ALARM_KINDS.index(kind), predicted_low_at, last_alarm_at)
+        body = body.ljust(STATE_END - BODY_START, b'\0')
+
+        self._seq += 1
+        struct.pack_into('<I', self.map, 4, self._seq)
+        self.map[BODY_START:STATE_END] = body
+        struct.pack_into('<I', self.map, 8, zlib.crc32(body))
+        self._seq += 1
+        struct.pack_into('<I', self.map, 4, self._seq)
+
+    def read(self):
+        """The published state as a dict, or None if there is none (yet)."""
+        if self.map is None and not self._open():
+            return None
+        if self.map[:4] != MAGIC:
+            return None
+
+        for _ in range(100):
+            seq = struct.unpack_from('<I', self.map, 4)[0]
+            if seq & 1:
+                time.sleep(0.0001)
+                continue
+            crc, body = struct.unpack_from('<I', self.map, 8)[0], self.map[BODY_START:STATE_END]
+            if struct.unpack_from('<I', self.map, 4)[0] == seq and zlib.crc32(body) == crc:
+                break
+        else:
+            return None
+
+        _, _, _, pid, count, heartbeat, muted_until, alarm_active = HEADER.unpack(bytes(BODY_START) + body[:HEADER.size - BODY_START])
+        accounts = {}
+        for i in range(min(count, MAX_ACCOUNTS)):
+            name, reading_time, mg_dl, trend, kind, predicted_low_at, last_alarm_at = SLOT.unpack_from(
+                body, HEADER.size - BODY_START + i * SLOT.size)
+            accounts[name.rstrip(b'\0').decode(errors='replace')] = {
+                'reading_time': reading_time or None,
+                'mg_dl': mg_dl if reading_time else None,
+                'trend': trend,
+                'alarm': ALARM_KINDS[kind] if kind < len(ALARM_KINDS) else None,
+                'predicted_low_at': predicted_low_at or None,
+                'last_alarm_at': last_alarm_at or None,
+            }
+        return {
+            'pid': pid,
+            'heartbeat': heartbeat,
+            'muted_until': muted_until or None,
+            'alarm_active': alarm_active,
+            'accounts': accounts,
+        }
+
+    def alive(self, timeout):
+        """True if the engine published within timeout seconds."""
+        state = self.read()
+        return state is not None and time.monotonic() - state['heartbeat'] < timeout
+
+    def requests(self):
+        """(mute sequence, mute until, command sequence, command) as last written by the UI."""
+        return REQUESTS.unpack_from(self.map, STATE_END)
+
+    def request_mute(self, until):
+        """Ask the engine to mute until the epoch time until, or to unmute with 0."""
+        if self.map is None and not self._open():
+            return False
+        mute_seq, _, command_seq, command = self.requests()
+        # Value first, then the sequence number the engine watches
+        REQUESTS.pack_into(self.map, STATE_END, mute_seq, until, command_seq, command)
+        struct.pack_into('<I', self.map, STATE_END, mute_seq + 1)
+        return True
+
+    def request(self, command):
+        """Ask the engine to 'stop', to 'update' now, or to play 'test_low' or 'test_high'."""
+        if self.map is None and not self._open():
+            return False
+        mute_seq, mute_until, command_seq, _ = self.requests()
+        REQUESTS.pack_into(self.map, STATE_END, mute_seq, mute_until, command_seq, COMMANDS.index(command))
+        struct.pack_into('<I', self.map, STATE_END + REQUESTS.size - 5, command_seq + 1)
+        return True
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+
+class EngineReader:
+    """Reads the engine's state on one thread for all of the UI's accounts.
+
+    It looks again FAST_INTERVAL after something changed, and backs off to
+    SLOW_INTERVAL while only the heartbeat moves, so an idle clock mostly sleeps.
+    """
+
+    FAST_INTERVAL = 0.25
+    SLOW_INTERVAL = 2
+
+    def __init__(self, state):
+        self.state = state
+        self.sources = {}  # Account name -> SharedStateSource
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def add(self, source):
+        with self._lock:
+            self.sources[source.name] = source
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="EngineReader", daemon=True)
+                self._thread.start()
+
+    def remove(self, source):
+        with self._lock:
+            self.sources.pop(source.name, None)
+            if not self.sources:
+                self._stop.set()
+
+    def _run(self):
+        interval, last = self.FAST_INTERVAL, None
+        while not self._stop.wait(interval):
+            state = self.state.read()
+            changes = state and (state['muted_until'], state['alarm_active'], state['accounts'])
+            if changes == last:
+                interval = min(interval * 2, self.SLOW_INTERVAL)
+                continue
+            interval, last = self.FAST_INTERVAL, changes
+
+            for name, slot in (state['accounts'] if state else {}).items():
+                source = self.sources.get(name)
+                if source and slot['mg_dl'] is not None:
+                    source.update(slot)
+
+
+class SharedStateSource:
+    """An account's readings as the engine publishes them, for the UI process.
+
+    A push source (see sources.py) without a thread of its own: an
+    EngineReader hands it the account's slot.
+    """
+
+    push = True
+
+    def __init__(self, name, reader):
+        self.name = name
+        self.reader = reader
+        self.reading = None
+        self._on_reading = None
+
+    def get_current_glucose_reading(self):
+        reading = self.reading
+        if reading is None or time.time() - reading.datetime.timestamp() > MAX_AGE:
+            return None
+        return reading
+
+    def start(self, on_reading):
+        self._on_reading = on_reading
+        self.reader.add(self)
+
+    def stop(self):
+        self.reader.remove(self)
+
+    def update(self, slot):
+        """Pass on the slot's reading if it is newer than the last one; on the reader's thread."""
+        if self.reading is not None and slot['reading_time'] <= self.reading.datetime.timestamp():
+            return
+        self.reading = glucose_reading(slot['mg_dl'], slot['trend'], slot['reading_time'])
+        if self._on_reading:
+            self._on_reading(self.reading)
+
+
+class EnginePublisher:
+    """Publishes a DigitalClock's readings and alarm state and carries out the UI's requests."""
+
+    INTERVAL = 1  # Seconds between publishes, the heartbeat, and between looks at the UI's requests
+
+    def __init__(self, app, state):
+        self.app = app
+        self.state = state
+        self._mute_seq, _, self._command_seq, _ = state.requests()
+
+        # A mute from before an engine restart still holds
+        previous = state.read()
+        if previous and previous['muted_until'] and previous['muted_until'] > time.time():
+            app._set_mute(datetime.fromtimestamp(previous['muted_until']))
+
+    def start(self):
+        self._tick()
+
+    def _tick(self):
+        self._handle_requests()
+
+        app = self.app
+        slots = [
+            (account.name,
+             account.reading_time if account.last_mg_dl is not None else 0,
+             account.last_mg_dl or 0,
+             account.last_trend or 0,
+             app._alarm_kind(account),
+             account.predicted_low_at or 0,
+             account.last_alarm_time.timestamp() if account.last_alarm_time else 0)
+            for account in app.accounts
+        ]
+        muted_until = app.muted_until.timestamp() if app.muted_until and app.clock.now() < app.muted_until else 0
+        self.state.publish(muted_until, app.alarm_active, slots)
+        app.root.after(int(self.INTERVAL * 1000), self._tick)
+
+    def _handle_requests(self):
+        mute_seq, mute_until, command_seq, command = self.state.requests()
+        if mute_seq != self._mute_seq:
+            self._mute_seq = mute_seq
+            self.app._set_mute(datetime.fromtimestamp(mute_until) if mute_until > time.time() else None)
+
+        if command_seq != self._command_seq:
+            self._command_seq = command_seq
+            command = COMMANDS[command] if command < len(COMMANDS) else None
+            if command == 'stop':
+                print("Engine stopping at the UI's request")
+                self.app.root.quit()
+            elif command == 'test_low':
+                self.app._test_low_sound()
+            elif command == 'test_high':
+                self.app._test_high_sound()
+            elif command == 'update':
+                self.app._update_glucose()
+
+
+def run_engine():
+    """The engine: the clock without a display, publishing to ENGINE_STATE until stopped."""
+    import GlucoClock
+    import headless
+
+    from accounts import load_accounts
+
+    if not accounts_fit(len(load_accounts(settings.DEXCOM_CONFIG))):
+        return
+
+    headless.install(GlucoClock)
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+    state = SharedState(settings.ENGINE_STATE, create=True)
+    root = GlucoClock.create_root()
+    app = GlucoClock.DigitalClock(root, role='engine')
+    EnginePublisher(app, state).start()
+
+    signal.signal(signal.SIGTERM, lambda signum, frame: root.quit())
+    print(f"Engine running (pid {os.getpid()}), publishing to {settings.ENGINE_STATE}")
+    try:
+        root.mainloop()
+    finally:
+        app._exit_app()
+        state.close()
+
+
+def start_supervisor():
+    """Start `GlucoClock.py engine` in its own session, so it outlives the UI."""
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'GlucoClock.py')
+    subprocess.Popen([sys.executable, script, 'engine'], start_new_session=True)
+
+
+def supervise():
+    """Keep an engine process running: restart it with backoff when it dies or stops publishing.
+
+    An engine that exits cleanly (asked to stop by the UI) is not restarted.
+    Only one supervisor runs at a time; later ones exit at once.
+    """
+    import fcntl
+    from accounts import load_accounts
+
+    if not accounts_fit(len(load_accounts(settings.DEXCOM_CONFIG))):
+        return
+
+    os.makedirs(os.path.dirname(settings.ENGINE_STATE), exist_ok=True)
+    lock = open(settings.ENGINE_STATE + '.lock', 'w')
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        print("An engine supervisor is already running")
+        return
+
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'GlucoClock.py')
+    state = SharedState(settings.ENGINE_STATE)
+    backoff = Backoff(1, 60)
+    child = None
+
+    def terminate(signum, frame):
+        if child and child.poll() is None:
+            child.terminate()
+        sys.exit(0)
+    signal.signal(signal.SIGTERM, terminate)
+
+    while True:
+        started = time.monotonic()
+        child = subprocess.Popen([sys.executable, script, 'engine', '--no-supervise'])
+        while child.poll() is None:
+            time.sleep(1)
+            # Give a new engine time to start publishing, then expect a fresh heartbeat
+            if (time.monotonic() - started > settings.ENGINE_WATCHDOG
+                    and not state.alive(settings.ENGINE_WATCHDOG)):
+                print(f"Engine (pid {child.pid}) stopped publishing, restarting it")
+                child.kill()
+                child.wait()
+
+        if child.returncode == 0:
+            print("Engine stopped")
+            return
+        if time.monotonic() - started > 60:
+            backoff.reset()
+        delay = backoff.next_delay()
+        print(f"Engine exited with {child.returncode}, restarting in {delay:.1f} s")
+        time.sleep(delay)
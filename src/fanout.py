@@ -0,0 +1,295 @@
+import email.utils
+import hashlib
+import json
+import queue
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import websocket
+from backoff import Backoff
+from sources import PushSource, load_json
+
+
+class FanoutServer:
+    """Publish the readings this clock fetches to other displays on the LAN.
+
+    GET /latest                          newest Dexcom Share reading per account, {name: reading}
+    GET /history?account=NAME&since=TS   [[ts, mmol, trend], ...] from the reading store
+    GET /stats                           time in range and variability per account and window
+    GET /ws                              WebSocket pushing {"account": name, "reading": reading}
+
+    JSON responses carry an ETag and Last-Modified, and a matching
+    If-None-Match or If-Modified-Since gets an empty 304.
+    """
+
+    HISTORY_WINDOW = 24 * 3600  # Default for /history without since
+
+    def __init__(self, port, host='', store=None, stats=None):
+        """stats, if given, is called from server threads for the /stats response."""
+        self.store = store
+        self.stats = stats
+        self.latest = {}  # Account name -> Dexcom Share reading JSON
+        self.modified = None  # Epoch time of the newest reading
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+        self.httpd = ThreadingHTTPServer((host, port), FanoutHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.fanout = self
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="FanoutServer", daemon=True)
+        self.thread.start()
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def publish(self, account, reading, ts):
+        """Make a new reading of account the latest and push it to WebSocket clients."""
+        message = json.dumps({'account': account, 'reading': reading})
+        with self._lock:
+            self.latest[account] = reading
+            self.modified = max(self.modified or 0, ts)
+            subscribers = list(self._subscribers)
+        for messages in subscribers:
+            messages.put(message)
+
+    def subscribe(self, messages):
+        """Put the latest readings, then every published one, on the messages queue."""
+        with self._lock:
+            for account, reading in self.latest.items():
+                messages.put(json.dumps({'account': account, 'reading': reading}))
+            self._subscribers.add(messages)
+
+    def unsubscribe(self, messages):
+        with self._lock:
+            self._subscribers.discard(messages)
+
+    def stop(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for messages in subscribers:
+            messages.put(None)
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FanoutHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, pollers reuse their connection
+
+    PING_INTERVAL = 30  # Seconds between pings on an idle WebSocket
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        fanout = self.server.fanout
+
+        if url.path == '/latest':
+            with fanout._lock:
+                body, modified = json.dumps(fanout.latest), fanout.modified
+        elif url.path == '/history':
+            if fanout.store is None:
+                self.send_error(503, "No reading store")
+                return
+            try:
+                since = float(params.get('since', time.time() - fanout.HISTORY_WINDOW))
+            except ValueError:
+                self.send_error(400, "since must be epoch seconds")
+                return
+            rows = fanout.store.range(params.get('account', ''), since)
+            body, modified = json.dumps(rows), rows[-1][0] if rows else None
+        elif url.path == '/stats':
+            if fanout.stats is None:
+                self.send_error(503, "No statistics")
+                return
+            body, modified = json.dumps(fanout.stats()), fanout.modified
+        elif url.path == '/ws':
+            self._websocket()
+            return
+        else:
+            self.send_error(404)
+            return
+
+        self._send_json(body.encode(), modified)
+
+    def _send_json(self, body, modified):
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        not_modified = self._not_modified(etag, modified)
+
+        self.send_response(304 if not_modified else 200)
+        self.send_header('ETag', etag)
+        if modified is not None:
+            self.send_header('Last-Modified', email.utils.formatdate(modified, usegmt=True))
+        self.send_header('Cache-Control', 'no-cache')
+        if not_modified:
+            self.end_headers()
+            return
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_modified(self, etag, modified):
+        # If-None-Match wins over If-Modified-Since when both are sent
+        match = self.headers.get('If-None-Match')
+        if match is not None:
+            return match.strip() == '*' or etag in (tag.strip() for tag in match.split(','))
+
+        since = self.headers.get('If-Modified-Since')
+        if since and modified is not None:
+            try:
+                return int(modified) <= email.utils.parsedate_to_datetime(since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def _websocket(self):
+        key = self.headers.get('Sec-WebSocket-Key')
+        if self.headers.get('Upgrade', '').lower() != 'websocket' or not key:
+            self.send_error(400, "Expected a WebSocket upgrade")
+            return
+
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', websocket.accept_key(key))
+        self.end_headers()
+        self.close_connection = True
+
+        fanout = self.server.fanout
+        messages = queue.Queue()
+        send_lock = threading.Lock()
+
+        def send(payload, opcode=websocket.OP_TEXT):
+            with send_lock:
+                self.wfile.write(websocket.encode_frame(payload, opcode))
+
+        def read():
+            # Clients only send pings and close, but they have to be read
+            try:
+                while True:
+                    websocket.read_message(self.rfile, lambda payload: send(payload, websocket.OP_PONG))
+            except (websocket.WebSocketClosed, OSError):
+                messages.put(None)
+
+        threading.Thread(target=read, name="FanoutWebSocketReader", daemon=True).start()
+        fanout.subscribe(messages)
+        try:
+            while True:
+                try:
+                    message = messages.get(timeout=self.PING_INTERVAL)
+                except queue.Empty:
+                    send(b'', websocket.OP_PING)
+                    continue
+                if message is None:
+                    send(b'', websocket.OP_CLOSE)
+                    break
+                send(message)
+        except OSError:
+            pass  # Client went away
+        finally:
+            fanout.unsubscribe(messages)
+
+    def log_message(self, format, *args):
+        pass  # Every display polling would flood the console
+
+
+class FanoutClient(PushSource):
+    """Reads another clock's fan-out server; used in place of the Dexcom client.
+
+    New readings are pushed over the server's /ws WebSocket, which reconnects
+    with backoff when it drops. Polling /latest carries on as a fallback and
+    remembers the ETag of the last response, so polling while nothing has
+    changed only costs a 304.
+    """
+
+    def __init__(self, url, account, timeout=10):
+        super().__init__(account)
+        self.url = url.rstrip('/')
+        self.account = account
+        self.timeout = timeout
+        self.etag = None
+        self._single = None  # Name of the server's only account, when it is not ours
+        self._sock = None
+        self._backoff = Backoff(1, 60)
+
+    def get_current_glucose_reading(self):
+        from pydexcom import GlucoseReading
+
+        request = urllib.request.Request(self.url + '/latest')
+        if self.etag:
+            request.add_header('If-None-Match', self.etag)
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                readings = load_json(response, self.timeout)
+                self.etag = response.headers.get('ETag')
+        except urllib.error.HTTPError as e:
+            if e.code != 304:
+                raise
+        else:
+            reading = readings.get(self.account)
+            self._single = None
+            if reading is None and len(readings) == 1:
+                # A single account is used whatever the two clocks call it
+                self._single, reading = next(iter(readings.items()))
+            if reading:
+                reading = GlucoseReading(reading)
+                # Polls only fill in; new readings are passed on by the stream
+                if self.reading is None or reading.datetime > self.reading.datetime:
+                    self.reading = reading
+
+        # An unchanged reading gets old too, it is no current reading after MAX_AGE
+        return super().get_current_glucose_reading()
+
+    def stop(self):
+        super().stop()
+        sock = self._sock
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._stream()
+            except (OSError, ValueError, websocket.WebSocketClosed) as e:
+                if not self._stop.is_set():
+                    print(f"Fan-out stream error ({self.name}): {e}")
+            self._stop.wait(self._backoff.next_delay())
+
+    def _stream(self):
+        from pydexcom import GlucoseReading
+
+        parts = urllib.parse.urlsplit(self.url)
+        scheme = 'wss' if parts.scheme == 'https' else 'ws'
+        sock, rfile = websocket.connect(f"{scheme}://{parts.netloc}{parts.path}/ws", self.timeout)
+        # The server pings an idle stream, so a longer silence means the connection is dead
+        sock.settimeout(FanoutHandler.PING_INTERVAL + self.timeout)
+        self._sock = sock
+        self._backoff.reset()
+        send_lock = threading.Lock()
+
+        def pong(payload):
+            with send_lock:
+                sock.sendall(websocket.encode_frame(payload, websocket.OP_PONG, mask=True))
+
+        try:
+            while not self._stop.is_set():
+                _, payload = websocket.read_message(rfile, pong)
+                try:
+                    message = json.loads(payload)
+                    reading = GlucoseReading(message['reading'])
+                except Exception as e:
+                    print(f"Ignoring fan-out message ({self.name}): {e}")
+                    continue
+                if message['account'] in (self.account, self._single):
+                    self._received(reading)
+        finally:
+            self._sock = None
+            sock.close()
@@ -0,0 +1,140 @@
+import queue
+import threading
+import time
+
+import metrics
+
+
+def classify_error(error):
+    """'auth', 'network' or 'server' for an exception raised by a fetch.
+
+    Auth errors will not go away by retrying, network errors are on our side
+    of the connection, and server errors are Dexcom (or a fan-out server)
+    failing to answer properly.
+    """
+    from pydexcom.errors import AccountError, ArgumentError, ArgumentErrorEnum
+
+    if isinstance(error, AccountError):
+        return 'auth'
+    # Other ArgumentErrors are bad session ids or malformed readings, not the login
+    if isinstance(error, ArgumentError) and error.enum in (
+            ArgumentErrorEnum.USERNAME_INVALID, ArgumentErrorEnum.PASSWORD_INVALID,
+            ArgumentErrorEnum.ACCOUNT_ID_INVALID, ArgumentErrorEnum.ACCOUNT_ID_DEFAULT,
+            ArgumentErrorEnum.TOO_MANY_USER_ID_PROVIDED, ArgumentErrorEnum.NONE_USER_ID_PROVIDED):
+        return 'auth'
+    # requests' HTTPError has the response, urllib's carries the status itself
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'code', None)
+    if isinstance(status, int):
+        return 'auth' if status in (401, 403) else 'server'
+    if isinstance(error, OSError):
+        # Connection failures and timeouts, from requests, urllib and sockets alike
+        return 'network'
+    return 'server'
+
+
+class FetchPool:
+    """A fixed number of daemon worker threads shared by all account fetchers.
+
+    Daemon threads so a hung Dexcom request never keeps the app from exiting.
+    """
+
+    def __init__(self, workers):
+        self._jobs = queue.Queue()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"GlucoseFetcher-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, job):
+        self._jobs.put(job)
+
+    def stop(self):
+        """Let the workers exit after any fetch in progress."""
+        for _ in self._threads:
+            self._jobs.put(None)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            job()
+
+
+class GlucoseFetcher:
+    """Fetch one account's glucose readings on a FetchPool so the Tk loop never waits on the network.
+
+    Push sources (see sources.py) are started once connected and put their
+    readings on the same results queue between polls.
+    """
+
+    def __init__(self, name, connect, pool, results, wake=None):
+        """connect() is called on a worker to create the glucose source.
+
+        Finished results are put on results as (name, kind, result), with kind
+        'reading', 'error' or 'connect_error'; errors come with the exception.
+        wake(), if given, is called on the source's thread after each pushed
+        reading, so the Tk loop need not keep polling results.
+        """
+        self.name = name
+        self.connect = connect
+        self.client = None
+        self.pool = pool
+        self.results = results
+        self.wake = wake
+        self._pending = threading.Event()
+
+    @property
+    def busy(self):
+        """True while a fetch has been requested and its result is not posted yet."""
+        return self._pending.is_set()
+
+    @property
+    def pushing(self):
+        """True once the source is connected and pushes readings itself."""
+        return getattr(self.client, 'push', False)
+
+    def stop(self):
+        """Close a push source's connection."""
+        if self.pushing:
+            self.client.stop()
+
+    def request(self):
+        """Ask for a new reading. Returns False if a fetch is already in flight."""
+        if self._pending.is_set():
+            return False
+        self._pending.set()
+        self.pool.submit(self._fetch)
+        return True
+
+    def _fetch(self):
+        started = time.perf_counter()
+        try:
+            if self.client is None:
+                try:
+                    self.client = self.connect()
+                    print(f"Glucose source connected ({self.name})")
+                except Exception as e:
+                    metrics.fetch_errors.inc(account=self.name, kind='connect', cause=classify_error(e))
+                    self.results.put((self.name, 'connect_error', e))
+                    return
+                if self.pushing:
+                    self.client.start(self._pushed)
+
+            bg = self.client.get_current_glucose_reading()
+            metrics.fetches.inc(account=self.name)
+            self.results.put((self.name, 'reading', bg))
+        except Exception as e:
+            metrics.fetch_errors.inc(account=self.name, kind='fetch', cause=classify_error(e))
+            self.results.put((self.name, 'error', e))
+        finally:
+            metrics.fetch_seconds.observe(time.perf_counter() - started, account=self.name)
+            self._pending.clear()
+
+    def _pushed(self, bg):
+        self.results.put((self.name, 'reading', bg))
+        if self.wake:
+            self.wake()
@@ -0,0 +1,101 @@
+"""Tk stand-ins for running the clock without a display (benchmarks and replays)."""
+
+import heapq
+import itertools
+import threading
+import time
+import types
+from collections import deque
+
+
+class HeadlessWidget:
+    """Accepts any Tk widget call and does nothing, returning a fresh item id."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            return next(self._ids)
+        return call
+
+
+class HeadlessRoot(HeadlessWidget):
+    """Tk root replacement with a real-time after() event loop.
+
+    Like Tk, event_generate() may be called from other threads; the handler
+    bind() gave for the event then runs on the loop.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._timers = []
+        self._cancelled = set()
+        self._seq = itertools.count(1)
+        self._running = False
+        self._bindings = {}
+        self._events = deque()
+        self._wakeup = threading.Event()
+
+    def after(self, ms, func, *args):
+        timer_id = next(self._seq)
+        heapq.heappush(self._timers, (time.monotonic() + ms / 1000, timer_id, func, args))
+        return timer_id
+
+    def after_cancel(self, timer_id):
+        self._cancelled.add(timer_id)
+
+    def attributes(self, *args):
+        return False
+
+    def bind(self, sequence, func, add=None):
+        self._bindings[sequence] = func
+
+    def event_generate(self, sequence, **kwargs):
+        self._events.append(sequence)
+        self._wakeup.set()
+
+    def update(self):
+        pass
+
+    def quit(self):
+        self._running = False
+        self._wakeup.set()
+
+    def mainloop(self):
+        self._running = True
+        while self._running and self._timers:
+            while self._events:
+                handler = self._bindings.get(self._events.popleft())
+                if handler:
+                    handler(None)
+
+            due, timer_id, func, args = self._timers[0]
+            if timer_id in self._cancelled:
+                heapq.heappop(self._timers)
+                self._cancelled.discard(timer_id)
+                continue
+            delay = due - time.monotonic()
+            if delay > 0:
+                # Until the timer is due, or another thread generates an event
+                self._wakeup.wait(delay)
+                self._wakeup.clear()
+                continue
+            heapq.heappop(self._timers)
+            func(*args)
+
+
+headless_tk = types.SimpleNamespace(
+    Tk=HeadlessRoot, Canvas=HeadlessWidget, Label=HeadlessWidget,
+    Button=HeadlessWidget, Frame=HeadlessWidget, TclError=RuntimeError,
+    TOP='top', BOTTOM='bottom', LEFT='left', RIGHT='right', X='x', CENTER='center', FLAT='flat',
+)
+
+
+def install(module):
+    """Stub out Tk and font lookup in the GlucoClock module."""
+    module.tk = headless_tk
+    module.resolve_font_families = lambda preferences, cache_path: {
+        name: preferred[-1] for name, preferred in preferences.items()
+    }
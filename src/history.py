@@ -0,0 +1,63 @@
+import numpy as np
+
+
+class GlucoseHistory:
+    """Fixed-capacity ring buffer of glucose readings backed by NumPy arrays.
+
+    Every sample is written twice, at slot i and i + capacity, so the newest
+    n samples are always one contiguous slice. Windows are returned as
+    read-only views without copying; a view stays valid until the samples
+    in it are overwritten by later appends.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = np.zeros(2 * capacity, dtype=np.int64)  # Sensor time, epoch seconds
+        self.values = np.zeros(2 * capacity, dtype=np.float32)    # mmol/L
+        self.trends = np.zeros(2 * capacity, dtype=np.int8)       # Dexcom trend 0-9
+        self._next = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def latest_timestamp(self):
+        """Sensor time of the newest reading, or None if empty."""
+        if not self.count:
+            return None
+        return int(self.timestamps[self._next - 1 + self.capacity])
+
+    def append(self, timestamp, value, trend):
+        """Add a reading in O(1). Returns False if it is not newer than the latest one."""
+        if self.count and timestamp <= self.latest_timestamp:
+            return False
+
+        i = self._next
+        j = i + self.capacity
+        self.timestamps[i] = self.timestamps[j] = timestamp
+        self.values[i] = self.values[j] = value
+        self.trends[i] = self.trends[j] = trend
+
+        self._next = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        return True
+
+    def last(self, n):
+        """Views (timestamps, values, trends) of the newest n readings, oldest first."""
+        n = min(n, self.count)
+        end = self._next + self.capacity
+        return self._view(end - n, end)
+
+    def since(self, timestamp):
+        """Views (timestamps, values, trends) of readings taken at or after timestamp."""
+        end = self._next + self.capacity
+        start = end - self.count
+        start += int(np.searchsorted(self.timestamps[start:end], timestamp, side='left'))
+        return self._view(start, end)
+
+    def _view(self, start, end):
+        views = (self.timestamps[start:end], self.values[start:end], self.trends[start:end])
+        for view in views:
+            view.flags.writeable = False
+        return views
@@ -0,0 +1,116 @@
+"""Export and import stored readings as .npz files, a chunk at a time.
+
+An export holds one array per column, all of the same length:
+
+    ts        int32    epoch seconds
+    mmol      float32  glucose in mmol/L
+    trend     int8     Dexcom trend, 0-9
+    account   int16    index into accounts
+    accounts  unicode  account names
+
+so np.load() reads it straight into numpy. The .npy members are written
+header first and then filled chunk by chunk from SQLite, and read back the
+same way, so memory use stays flat however long the history is.
+"""
+
+import zipfile
+
+import numpy as np
+
+
+CHUNK = 65536  # Rows per read or write
+
+COLUMNS = (
+    ('ts', np.dtype('<i4')),
+    ('mmol', np.dtype('<f4')),
+    ('trend', np.dtype('i1')),
+    ('account', np.dtype('<i2')),
+)
+
+
+def _where(accounts, since, until):
+    clauses, params = ["ts >= ?", "ts < ?"], [int(since), int(until)]
+    if accounts:
+        clauses.append(f"account IN ({', '.join('?' * len(accounts))})")
+        params.extend(accounts)
+    return " AND ".join(clauses), params
+
+
+def export_readings(store, path, accounts=None, since=0, until=2**31 - 1, compress=False):
+    """Write the readings of accounts (all if None) with since <= ts < until to path. Returns the row count."""
+    db = store.db
+    where, params = _where(accounts, since, until)
+
+    # One read transaction, so every column sees the same rows while the clock keeps writing
+    db.execute("BEGIN")
+    try:
+        names = [row[0] for row in db.execute(
+            f"SELECT DISTINCT account FROM readings WHERE {where} ORDER BY account", params)]
+        codes = {name: code for code, name in enumerate(names)}
+        count = db.execute(f"SELECT COUNT(*) FROM readings WHERE {where}", params).fetchone()[0]
+
+        compression = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        with zipfile.ZipFile(path, 'w', compression=compression, allowZip64=True) as archive:
+            for column, (name, dtype) in enumerate(COLUMNS):
+                with archive.open(name + '.npy', 'w', force_zip64=True) as member:
+                    np.lib.format.write_array_header_1_0(member, {
+                        'descr': np.lib.format.dtype_to_descr(dtype),
+                        'fortran_order': False,
+                        'shape': (count,),
+                    })
+                    cursor = db.execute(
+                        f"SELECT ts, mmol, trend, account FROM readings WHERE {where} ORDER BY account, ts", params)
+                    while True:
+                        rows = cursor.fetchmany(CHUNK)
+                        if not rows:
+                            break
+                        if name == 'account':
+                            values = [codes[row[3]] for row in rows]
+                        else:
+                            values = [row[column] for row in rows]
+                        member.write(np.asarray(values, dtype=dtype).tobytes())
+
+            with archive.open('accounts.npy', 'w') as member:
+                np.lib.format.write_array(member, np.array(names, dtype=str))
+    finally:
+        db.execute("COMMIT")
+    return count
+
+
+def _open_column(archive, name):
+    member = archive.open(name + '.npy')
+    version = np.lib.format.read_magic(member)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(member)
+    elif version == (2, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(member)
+    else:
+        raise ValueError(f"Unsupported .npy version {version}")
+    if len(shape) != 1 or fortran_order:
+        raise ValueError(f"{name} is not a flat column")
+    return member, shape[0], dtype
+
+
+def import_readings(store, path, account=None):
+    """Add the readings in path to store, under account if given. Returns the row count read.
+
+    Readings that are already stored are left alone.
+    """
+    with zipfile.ZipFile(path) as archive:
+        names = np.load(archive.open('accounts.npy')).tolist()
+        columns = [_open_column(archive, name) for name, _ in COLUMNS]
+        count = columns[0][1]
+        if any(length != count for _, length, _ in columns):
+            raise ValueError("Columns differ in length")
+
+        done = 0
+        while done < count:
+            size = min(CHUNK, count - done)
+            ts, mmol, trend, codes = (
+                np.frombuffer(member.read(size * dtype.itemsize), dtype=dtype)
+                for member, _, dtype in columns
+            )
+            accounts = [account] * size if account else [names[code] for code in codes.tolist()]
+            store.insert(zip(accounts, ts.tolist(), mmol.astype(np.float64).round(1).tolist(), trend.tolist()))
+            done += size
+    return count
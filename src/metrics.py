@@ -0,0 +1,195 @@
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Seconds, from a fast redraw up to a Dexcom request timing out
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """A named metric with one value (or histogram) per set of labels.
+
+    Counters and gauges may instead be read from collect() at scrape time,
+    which returns (labels, value) pairs.
+    """
+
+    kind = None
+
+    def __init__(self, name, help, collect=None):
+        self.name = name
+        self.help = help
+        self.collect = collect
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        if self.collect:
+            values = {_label_key(labels): value for labels, value in self.collect()}
+            with self._lock:
+                self._values = values
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the time spent in the with block."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = _format_value(bound if bound == float('inf') else float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """All metrics of the process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _process_rss():
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # Peak, KB on Linux
+    return [({}, rss)]
+
+
+def _process_cpu():
+    times = os.times()
+    return [({}, times.user + times.system)]
+
+
+registry = Registry()
+
+fetches = registry.add(Counter('glucoclock_fetches_total', "Dexcom fetches that returned, including empty readings."))
+fetch_errors = registry.add(Counter('glucoclock_fetch_errors_total', "Dexcom fetches that failed, by kind and cause."))
+fetch_circuit_open = registry.add(Gauge('glucoclock_fetch_circuit_open', "1 while repeated failures keep an account's glucose source from being polled."))
+fetch_seconds = registry.add(Histogram('glucoclock_fetch_seconds', "Time for one Dexcom fetch, including any login."))
+reading_age_seconds = registry.add(Gauge('glucoclock_reading_age_seconds', "Age of the newest glucose reading."))
+redraw_seconds = registry.add(Histogram('glucoclock_redraw_seconds', "Time to update a glucose symbol."))
+tick_lateness_seconds = registry.add(Histogram('glucoclock_tick_lateness_seconds', "How late the Tk ticker woke after its boundary."))
+alarm_latency_seconds = registry.add(Histogram('glucoclock_alarm_latency_seconds', "Time from deciding to alarm until the sound is audible."))
+registry.add(Gauge('process_resident_memory_bytes', "Resident memory size in bytes.", _process_rss))
+registry.add(Counter('process_cpu_seconds_total', "User and system CPU time in seconds.", _process_cpu))
+
+
+class MetricsServer:
+    """Serve registry at /metrics from a daemon thread."""
+
+    def __init__(self, port, host='', registry=registry):
+        # Only needed when metrics are enabled, keep it off the startup path
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Scrapes every few seconds would flood the console
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="MetricsServer", daemon=True)
+        self.thread.start()
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
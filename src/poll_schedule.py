@@ -0,0 +1,58 @@
+class PollScheduler:
+    """Predict when the next CGM reading lands on Dexcom Share and poll just after it.
+
+    Sensors produce a reading every `cadence` seconds and Share publishes it a
+    little later. The scheduler aims at reading time + cadence + upload delay,
+    and if nothing new has arrived by then it falls back to short follow-up
+    polls from `late_delays`. Once those are used up the sensor is probably
+    offline, so it polls every `idle_interval` until readings come back.
+    """
+
+    def __init__(self, cadence, upload_delay, late_delays, idle_interval):
+        self.cadence = cadence
+        self.upload_delay = upload_delay
+        self.min_upload_delay = upload_delay
+        self.late_delays = late_delays
+        self.idle_interval = idle_interval
+        self.last_reading_time = None
+        self.misses = 0
+
+    def configure(self, cadence, upload_delay, late_delays, idle_interval):
+        """Use new timings from the next poll on, keeping what was learnt about the upload delay."""
+        self.cadence = cadence
+        self.upload_delay = max(upload_delay, min(self.upload_delay, cadence / 4))
+        self.min_upload_delay = upload_delay
+        self.late_delays = late_delays
+        self.idle_interval = idle_interval
+
+    def next_poll(self, reading_time, now):
+        """Seconds until the next poll, given the reading time (epoch) just fetched."""
+        if reading_time is None or (self.last_reading_time is not None
+                                    and reading_time <= self.last_reading_time):
+            return self._late()
+
+        age = now - reading_time
+        if self.last_reading_time is not None:
+            if 0 < self.misses <= len(self.late_delays):
+                # We polled too early, wait longer for the upload next time
+                self.upload_delay = min(age, self.cadence / 4)
+            elif not self.misses:
+                # Hit on the first try, probe a little earlier next time
+                self.upload_delay = max(self.min_upload_delay, self.upload_delay - 2)
+        self.last_reading_time = reading_time
+        self.misses = 0
+
+        delay = self.cadence + self.upload_delay - age
+        if delay <= 0:
+            # The following reading should already be there
+            return self._late()
+        return max(1, round(delay))
+
+    def _late(self):
+        """Delay for a follow-up poll when the expected reading has not arrived."""
+        if self.misses < len(self.late_delays):
+            delay = self.late_delays[self.misses]
+        else:
+            delay = self.idle_interval
+        self.misses += 1
+        return delay
@@ -0,0 +1,38 @@
+import numpy as np
+
+
+def predict_low(timestamps, values, now, threshold, window, horizon, min_readings):
+    """Predict when glucose crosses below threshold from a straight-line fit.
+
+    Fits a least-squares line through the readings of the last window
+    seconds (timestamps in epoch seconds, ascending) and returns the epoch
+    time the line reaches threshold, if that is within horizon seconds from
+    now. Returns None when glucose is not falling, is already below the
+    threshold, or there are too few recent readings.
+    """
+    start = int(np.searchsorted(timestamps, now - window, side='left'))
+    if len(timestamps) - start < min_readings:
+        return None
+
+    # Seconds relative to the newest reading keeps the fit well conditioned
+    newest = timestamps[-1]
+    t = (timestamps[start:] - newest).astype(np.float64)
+    v = values[start:].astype(np.float64)
+
+    t_mean = t.mean()
+    dt = t - t_mean
+    spread = np.dot(dt, dt)
+    if spread == 0:
+        return None
+    slope = np.dot(dt, v - v.mean()) / spread  # mmol/L per second
+    if slope >= 0:
+        return None
+
+    fitted_now = v.mean() + slope * (now - newest - t_mean)
+    if fitted_now <= threshold:
+        return None
+
+    seconds = (threshold - fitted_now) / slope
+    if seconds > horizon:
+        return None
+    return now + seconds
@@ -0,0 +1,132 @@
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+
+active = None  # The installed CallbackProfiler, if profiling is on
+
+
+def callback_name(func):
+    return getattr(func, '__qualname__', None) or type(func).__name__
+
+
+class CallbackProfiler:
+    """Wall time and lateness of every Tk callback, kept in a bounded buffer.
+
+    install() times root.after() callbacks (late by how long after their
+    requested delay they ran) and every Tk command and event handler; the
+    Ticker times its own jobs. Only the newest capacity calls are kept, so
+    it can stay on for days. SIGUSR1 prints a summary of the buffer and
+    SIGUSR2 samples the Tk thread's stack for a while, so a sluggish unit
+    can be looked at without restarting it.
+    """
+
+    SAMPLE_INTERVAL = 0.005  # Seconds between stack samples
+
+    def __init__(self, capacity, sample_seconds=10):
+        self.calls = deque(maxlen=capacity)  # (name, kind, wall seconds, lateness seconds)
+        self.sample_seconds = sample_seconds
+        self._thread_id = threading.get_ident()  # Tk runs on the thread that installs the profiler
+        self._sampling = False
+
+    def call(self, name, kind, lateness, func, *args):
+        """Run func(*args) and record how long it took."""
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            self.calls.append((name, kind, time.perf_counter() - started, lateness))
+
+    def install(self, root):
+        """Time root's after() callbacks and all Tk handlers; SIGUSR1 and SIGUSR2 report."""
+        global active
+        active = self
+
+        after = root.after
+
+        def timed_after(ms, func=None, *args):
+            if func is None:
+                return after(ms)
+            name = callback_name(func)
+            due = time.perf_counter() + ms / 1000
+
+            def callback(*args):
+                return self.call(name, 'after', max(0.0, time.perf_counter() - due), func, *args)
+            return after(ms, callback, *args)
+        root.after = timed_after
+
+        import tkinter
+        wrapper_call = tkinter.CallWrapper.__call__
+
+        def timed_wrapper_call(wrapper, *args):
+            # after() runs its callback through a Tk command too, and that is timed already
+            if getattr(wrapper.func, '__qualname__', '') == 'Misc.after.<locals>.callit':
+                return wrapper_call(wrapper, *args)
+            return self.call(callback_name(wrapper.func), 'event', 0.0, wrapper_call, wrapper, *args)
+        tkinter.CallWrapper.__call__ = timed_wrapper_call
+
+        if hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.report())
+            signal.signal(signal.SIGUSR2, lambda signum, frame: self.sample())
+
+    def report(self):
+        """Print calls, time taken and lateness per callback, most time taken first."""
+        calls = list(self.calls)
+        if not calls:
+            print("No callbacks recorded yet")
+            return
+
+        by_name = {}
+        for name, kind, wall, lateness in calls:
+            by_name.setdefault((name, kind), ([], []))
+            by_name[name, kind][0].append(wall)
+            by_name[name, kind][1].append(lateness)
+
+        print(f"Last {len(calls)} Tk callbacks:")
+        print(f"{'callback':<44}{'kind':<7}{'calls':>7}{'total ms':>10}{'mean ms':>9}{'max ms':>9}{'late p95':>10}{'late max':>10}")
+        for (name, kind), (walls, lateness) in sorted(by_name.items(), key=lambda item: -sum(item[1][0])):
+            lateness.sort()
+            p95 = lateness[min(len(lateness) - 1, int(len(lateness) * 0.95))]
+            print(f"{name[-43:]:<44}{kind:<7}{len(walls):>7}{sum(walls) * 1000:>10.1f}"
+                  f"{sum(walls) * 1000 / len(walls):>9.2f}{max(walls) * 1000:>9.2f}"
+                  f"{p95 * 1000:>10.1f}{lateness[-1] * 1000:>10.1f}")
+
+    def sample(self):
+        """Sample the Tk thread's stack for sample_seconds on a background thread, then print the result."""
+        if self._sampling:
+            return
+        self._sampling = True
+        print(f"Sampling the Tk thread for {self.sample_seconds} s")
+        threading.Thread(target=self._sample, name="CallbackProfilerSampler", daemon=True).start()
+
+    def _sample(self):
+        own, inclusive = Counter(), Counter()
+        samples = 0
+        deadline = time.monotonic() + self.sample_seconds
+        try:
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(self._thread_id)
+                seen = set()
+                while frame is not None:
+                    code = frame.f_code
+                    where = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    if not seen:
+                        own[where] += 1
+                    if where not in seen:
+                        # Recursive functions count once per sample
+                        inclusive[where] += 1
+                        seen.add(where)
+                    frame = frame.f_back
+                samples += 1
+                time.sleep(self.SAMPLE_INTERVAL)
+        finally:
+            self._sampling = False
+
+        # Idle time shows up as the mainloop call itself
+        print(f"{samples} samples of the Tk thread:")
+        print(f"{'function':<60}{'own %':>8}{'total %':>9}")
+        for where, count in inclusive.most_common(25):
+            print(f"{where[-59:]:<60}{100 * own[where] / samples:>8.1f}{100 * count / samples:>9.1f}")
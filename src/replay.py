@@ -0,0 +1,179 @@
+"""Replay recorded readings through the real clock, many times faster than real time.
+
+    python replay.py night.npz --headless                  # an export from `GlucoClock.py export`
+    python replay.py ~/.glucoclock/readings.sqlite3 --since 2024-05-01T22:00 --until 2024-05-02T07:00
+    python replay.py night.npz --speed 1000 --mute 02:10   # press Mute at 02:10
+
+The clock runs on a virtual clock starting at the first reading (or
+--since). A fake Dexcom hands out the newest recorded reading the virtual
+clock has reached, so readings go through the same fetch, alarm, mute and
+dimming code as live ones. Every alarm decision, mute and brightness change
+is printed with its virtual time.
+"""
+
+import argparse
+import bisect
+import collections
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import GlucoClock
+import headless
+from backlight import make_fake_backlight
+from clock import VirtualClock
+from settings import settings
+
+
+class ReplayDexcom:
+    """Stand-in for pydexcom.Dexcom returning the newest recorded reading the clock has reached."""
+
+    MAX_AGE = 600  # Dexcom Share has no current reading once the newest is 10 minutes old
+
+    def __init__(self, readings, clock):
+        self.readings = readings  # [(ts, mmol, trend), ...], oldest first
+        self.timestamps = [ts for ts, _, _ in readings]
+        self.clock = clock
+
+    def get_current_glucose_reading(self):
+        from pydexcom import GlucoseReading
+        from pydexcom.const import DEXCOM_TREND_DIRECTIONS, MMOL_L_CONVERSION_FACTOR
+
+        now = self.clock.time()
+        index = bisect.bisect_right(self.timestamps, now) - 1
+        if index < 0 or now - self.timestamps[index] > self.MAX_AGE:
+            return None
+
+        ts, mmol, trend = self.readings[index]
+        directions = {number: name for name, number in DEXCOM_TREND_DIRECTIONS.items()}
+        return GlucoseReading({
+            'Value': round(mmol / MMOL_L_CONVERSION_FACTOR),
+            'Trend': directions.get(trend, 'None'),
+            'DT': f"Date({int(ts * 1000)}+0000)",
+        })
+
+
+def load_readings(path, since=0, until=2**31 - 1):
+    """{account: [(ts, mmol, trend), ...]} from a .npz export or a reading store."""
+    readings = collections.defaultdict(list)
+    if path.endswith('.npz'):
+        import numpy as np
+
+        with np.load(path) as data:
+            names = data['accounts'].tolist()
+            for ts, mmol, trend, code in zip(*(data[name].tolist() for name in ('ts', 'mmol', 'trend', 'account'))):
+                if since <= ts < until:
+                    readings[names[code]].append((ts, round(mmol, 1), trend))
+    else:
+        from store import ReadingStore
+
+        store = ReadingStore(path)
+        try:
+            for (name,) in store.db.execute("SELECT DISTINCT account FROM readings"):
+                readings[name] = store.range(name, since, until)
+        finally:
+            store.close()
+
+    for rows in readings.values():
+        rows.sort()
+    return {name: rows for name, rows in readings.items() if rows}
+
+
+class DecisionLog:
+    """Prints what the clock decided, with the virtual time, and counts the alarm decisions."""
+
+    def __init__(self):
+        self.counts = collections.Counter()
+
+    def __call__(self, now, message):
+        print(f"{now:%Y-%m-%d %H:%M:%S}  {message}")
+        if ': ' in message:
+            self.counts[message.rpartition(': ')[2]] += 1
+
+    def report(self):
+        print(", ".join(f"{decision} {count}" for decision, count in self.counts.most_common()))
+
+
+def next_time_of_day(start, text):
+    """Epoch time of the first HH:MM at or after the epoch time start."""
+    hour, minute = (int(part) for part in text.split(':'))
+    when = datetime.fromtimestamp(start).replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if when.timestamp() < start:
+        when += timedelta(days=1)
+    return when.timestamp()
+
+
+def run(args):
+    def epoch(date):
+        return datetime.fromisoformat(date).timestamp() if date else None
+
+    readings = load_readings(args.file, epoch(args.since) or 0, epoch(args.until) or 2**31 - 1)
+    if args.account:
+        readings = {name: rows for name, rows in readings.items() if name in args.account}
+    if not readings:
+        print(f"No readings to replay in {args.file}")
+        return
+
+    start = epoch(args.since) or min(rows[0][0] for rows in readings.values())
+    end = epoch(args.until) or max(rows[-1][0] for rows in readings.values()) + ReplayDexcom.MAX_AGE
+
+    if args.headless or not os.environ.get('DISPLAY'):
+        print("Rendering stubbed out (no display)")
+        headless.install(GlucoClock)
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+    # Leave the real store and backlight alone, and keep the overrides from being reloaded
+    scratch = tempfile.mkdtemp(prefix='glucoclock-replay-')
+    settings.READING_STORE = os.path.join(scratch, 'readings.sqlite3')
+    settings.BACKLIGHT_DIR = make_fake_backlight(os.path.join(scratch, 'backlight'))
+    settings.CONFIG_CHECK_INTERVAL = None
+    settings.METRICS_PORT = None
+    settings.FANOUT_PORT = None
+    settings.FANOUT_SOURCE = None
+    settings.DEXCOM_CONFIG = [
+        {'name': name, 'username': name, 'password': '', 'region': 'ous'} for name in readings
+    ]
+
+    print(f"Replaying {sum(len(rows) for rows in readings.values())} readings from "
+          f"{datetime.fromtimestamp(start):%Y-%m-%d %H:%M} to {datetime.fromtimestamp(end):%Y-%m-%d %H:%M} "
+          f"at {args.speed:g}x")
+
+    # Load the slow modules first; at replay speed their import time would be minutes on the clock
+    import numpy, pydexcom, pygame
+
+    log = DecisionLog()
+    clock = VirtualClock(start, args.speed)
+    root = GlucoClock.create_root()
+    app = GlucoClock.DigitalClock(
+        root,
+        dexcom_factory=lambda account: ReplayDexcom(readings[account.name], clock),
+        clock=clock,
+        decision_log=log,
+        role='standalone'
+    )
+
+    for text in args.mute or []:
+        app._after(next_time_of_day(start, text) - clock.time(), app._toggle_mute)
+    app._after(end - clock.time(), root.quit)
+    root.mainloop()
+
+    print()
+    log.report()
+    app._exit_app()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded readings through GlucoClock's alarms at high speed.")
+    parser.add_argument('file', help=".npz export or reading store to replay")
+    parser.add_argument('--since', help="virtual start date and time, e.g. 2024-05-01T22:00 (default: first reading)")
+    parser.add_argument('--until', help="virtual end date and time (default: just after the last reading)")
+    parser.add_argument('--account', action='append', help="account to replay, repeatable (default: all)")
+    parser.add_argument('--speed', type=float, default=300, help="virtual seconds per real second")
+    parser.add_argument('--mute', action='append', help="press Mute at this HH:MM, repeatable")
+    parser.add_argument('--headless', action='store_true', help="stub out Tk and audio even if a display is available")
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
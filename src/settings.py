@@ -3,6 +3,7 @@
 # CONSTANTS AND CONFIGURATION
 # ============================
 
+import os
 
 
 class settings:
@@ -14,6 +15,7 @@ class settings:
     # Audio configuration
     LOW_TONE_FREQ = 500    # Hz for deep tone (low glucose)
     HIGH_TONE_FREQ = 850  # Hz for high tone (high glucose)
+    PREDICTED_LOW_TONE_FREQ = 650  # Hz for predicted low tone
     TONE_DURATION = 2    # seconds
 
     # Alarm time window (22:30 - 07:00)
@@ -25,6 +27,8 @@ class settings:
     BRIGHTNESS_NIGHT = 0.1      # 10% brightness at night
     DIM_START_TIME = 22 * 60 + 30  # Start dimming at 22:30
     DIM_END_TIME = 7 * 60          # End dimming at 07:00
+    BRIGHTNESS_RAMP_TIME = 60      # Seconds to fade between day and night brightness
+    BACKLIGHT_DIR = "/sys/class/backlight/rpi_backlight"
 
     # Visual settings
     WINDOW_SIZE = "800x480"         # Example window size
@@ -32,9 +36,27 @@ class settings:
     SHADOW_OFFSET = 2          # Example shadow offset
     
     # Timing constants
-    UPDATE_INTERVAL = 300  # 5 minutes between glucose updates
+    UPDATE_INTERVAL = 300  # 5 minutes between glucose updates when no reading is expected
+    SENSOR_INTERVAL = 300  # CGM produces a reading every 5 minutes
+    SHARE_UPLOAD_DELAY = 15  # Seconds from sensor reading until it is on Dexcom Share
+    LATE_POLL_DELAYS = (15, 15, 30, 30, 60)  # Follow-up polls when a reading is late
     ALARM_INTERVAL = 120   # 2 minutes between alarms
+    ALARM_START_VOLUME = 0.6   # Volume of the first alarm, 0-1
+    ALARM_VOLUME_STEP = 0.2    # Louder by this much each time the alarm repeats
     MUTE_DURATION = 3600   # 1 hour mute duration in seconds
+    CONFIG_CHECK_INTERVAL = 5  # Seconds between checks for edited settings files, None to disable
+
+    # Predicted low alarm: straight-line fit over recent readings
+    PREDICTION_WINDOW = 20 * 60   # Seconds of readings used for the fit
+    PREDICTION_HORIZON = 20 * 60  # Alarm if a low is expected within this many seconds
+    PREDICTION_MIN_READINGS = 3
+
+    # Time in range and variability statistics
+    STATS_WINDOWS = (('24h', 24 * 3600), ('14d', 14 * 24 * 3600))  # (name, seconds)
+    STATS_PANEL = False  # Show them next to the glucose symbol
+
+    # Reading history kept in memory (14 days of 5-minute readings is 4032)
+    HISTORY_CAPACITY = 4096
 
 
     # UI color scheme
@@ -58,11 +80,52 @@ class settings:
 }
 
     # Dexcom configuration settings (default values)
+    # To monitor several accounts, use a list of these dicts, each with a 'name' to show
+    # Other sources, with a 'name': {'source': 'nightscout', 'url': ..., 'token': ...},
+    # {'source': 'file', 'path': ...} or {'source': 'socket', 'path': ...} (see sources.py)
     DEXCOM_CONFIG = {
         'username': '<insert>',
         'password': '<insert>',
         'region': 'ous'
     }
+    FETCH_WORKERS = 4  # Accounts fetched at the same time
+    DEXCOM_CONNECT_TIMEOUT = 5  # Seconds to connect to Dexcom
+    DEXCOM_DEADLINE = 20        # Seconds a fetch may take in all, login included
+    # A failed fetch is retried after a random delay of up to RETRY_BASE * 2**failures seconds
+    RETRY_BASE = 15
+    RETRY_CAP = 600  # Also the wait after a rejected login, so the account is not locked
+    # After BREAKER_THRESHOLD network or server errors in a row, stop polling for BREAKER_RESET seconds
+    BREAKER_THRESHOLD = 5
+    BREAKER_RESET = 300
+
+    # Prometheus metrics at http://<host>:<port>/metrics, None to disable
+    METRICS_PORT = None
+    METRICS_HOST = ''  # All interfaces, so the clocks can be scraped over the network
+
+    # Share readings with other displays at http://<host>:<port>/latest, None to disable
+    FANOUT_PORT = None
+    FANOUT_HOST = ''
+    # URL of another clock's fan-out server, to read from instead of Dexcom (secondary clocks)
+    FANOUT_SOURCE = None
+
+    # Time every Tk callback; kill -USR1 <pid> prints a summary, kill -USR2 <pid>
+    # samples where the Tk thread spends its time for PROFILE_SAMPLE_SECONDS
+    PROFILE_CALLBACKS = False
+    PROFILE_BUFFER = 10000  # Newest callback calls kept
+    PROFILE_SAMPLE_SECONDS = 10
+
+    # Fetch readings and sound alarms in a separate, supervised engine process
+    # (Linux); the window only shows the state the engine publishes
+    ENGINE_MODE = False
+    ENGINE_WATCHDOG = 30  # Seconds without a heartbeat before the engine is restarted
+
+    # Local cache (Dexcom session, ...)
+    CACHE_DIR = os.path.join(os.path.expanduser('~'), '.glucoclock')
+    DEXCOM_SESSION_CACHE = os.path.join(CACHE_DIR, 'dexcom_session.json')
+    FONT_CACHE = os.path.join(CACHE_DIR, 'fonts.json')
+    READING_STORE = os.path.join(CACHE_DIR, 'readings.sqlite3')
+    # Shared between the engine and the window; in memory where there is a /dev/shm
+    ENGINE_STATE = '/dev/shm/glucoclock.state' if os.path.isdir('/dev/shm') else os.path.join(CACHE_DIR, 'engine.state')
 
 # Import local settings if they exist (not tracked by git)
 try:
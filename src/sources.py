@@ -0,0 +1,380 @@
+"""Where each account's glucose readings come from.
+
+A source is any object with get_current_glucose_reading(), returning the
+newest pydexcom GlucoseReading or None; a GlucoseFetcher polls it on a
+worker thread. Push sources also have push = True, start(on_reading) and
+stop(): they call on_reading(reading) from a thread of their own as soon as
+a reading exists upstream, while polling carries on as a fallback.
+
+The source is chosen per account with a 'source' key in DEXCOM_CONFIG:
+
+    dexcom      Dexcom Share, polled (the default)
+    nightscout  'url', plus 'token' or 'api_secret'; pushed over Nightscout's socket.io stream
+    file        'path' of a file readings are appended to, one JSON object per line
+    socket      'path' of a UNIX socket to listen on for the same lines
+
+Feed lines hold Dexcom Share JSON, a Nightscout entry, or
+{"mmol": 5.4, "trend": "Flat", "time": 1714600000} (mgdl instead of mmol,
+trend as a name or 0-9, time in epoch seconds, defaulting to now).
+"""
+
+import hashlib
+import json
+import os
+import socket
+import stat
+import threading
+import time
+import urllib.parse
+import urllib.request
+from abc import ABC, abstractmethod
+
+import websocket
+from backoff import Backoff
+from settings import settings
+
+
+MAX_AGE = 600  # Like Dexcom Share, a reading older than 10 minutes is no current reading
+
+# Nightscout spellings of the Dexcom trend names
+NIGHTSCOUT_DIRECTIONS = {'NOT COMPUTABLE': 'NotComputable', 'RATE OUT OF RANGE': 'RateOutOfRange', 'NONE': 'None'}
+
+
+def make_source(account):
+    """The source for a GlucoseAccount, from its config and the settings."""
+    config = account.config
+    kind = config.get('source', 'dexcom')
+
+    # A secondary clock reads the primary clock's fan-out server
+    if settings.FANOUT_SOURCE:
+        from fanout import FanoutClient
+        return FanoutClient(settings.FANOUT_SOURCE, account.name)
+
+    if kind == 'dexcom':
+        from dexcom_session import CachedDexcom
+        return CachedDexcom(
+            account.session_cache,
+            connect_timeout=settings.DEXCOM_CONNECT_TIMEOUT,
+            deadline=settings.DEXCOM_DEADLINE,
+            username=config['username'],
+            password=config['password'],
+            region=config['region']
+        )
+    if kind == 'nightscout':
+        return NightscoutSource(account.name, config['url'], config.get('token'), config.get('api_secret'))
+    if kind == 'file':
+        return FileFeed(account.name, config['path'])
+    if kind == 'socket':
+        return SocketFeed(account.name, config['path'])
+    raise ValueError(f"Unknown glucose source {kind!r} for {account.name}")
+
+
+def glucose_reading(mg_dl, trend, ts):
+    """pydexcom GlucoseReading from a value in mg/dL, a trend name or number, and an epoch time."""
+    from pydexcom import GlucoseReading
+    from pydexcom.const import DEXCOM_TREND_DIRECTIONS
+
+    if isinstance(trend, int):
+        trend = next((name for name, number in DEXCOM_TREND_DIRECTIONS.items() if number == trend), 'None')
+    trend = NIGHTSCOUT_DIRECTIONS.get(trend, trend)
+    if trend not in DEXCOM_TREND_DIRECTIONS:
+        trend = 'None'
+    return GlucoseReading({'Value': round(mg_dl), 'Trend': trend, 'DT': f"Date({int(ts * 1000)}+0000)"})
+
+
+def parse_reading(entry, now):
+    """GlucoseReading from a feed line or Nightscout entry (see the module docstring)."""
+    from pydexcom import GlucoseReading
+    from pydexcom.const import MMOL_L_CONVERSION_FACTOR
+
+    if 'Value' in entry:
+        return GlucoseReading(entry)
+    if 'sgv' in entry:
+        # REST entries
+        return glucose_reading(entry['sgv'], entry.get('direction'), entry['date'] / 1000)
+    if 'mills' in entry:
+        # socket.io dataUpdate sgvs
+        return glucose_reading(entry['mgdl'], entry.get('direction'), entry['mills'] / 1000)
+    mg_dl = entry['mgdl'] if 'mgdl' in entry else entry['mmol'] / MMOL_L_CONVERSION_FACTOR
+    return glucose_reading(mg_dl, entry.get('trend', 'None'), entry.get('time', now))
+
+
+def load_json(response, timeout):
+    """json.load() for a urlopen() response, giving up if the body takes over timeout seconds.
+
+    urlopen()'s own timeout only limits each wait for data, so a server that
+    keeps trickling its answer would otherwise hold a fetcher indefinitely.
+    """
+    deadline = time.monotonic() + timeout
+    body = b''
+    while True:
+        chunk = response.read1(65536)
+        if not chunk:
+            return json.loads(body)
+        body += chunk
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"{response.url} still answering after {timeout} s")
+
+
+class PushSource(ABC):
+    """Base for sources that receive readings on a thread of their own."""
+
+    push = True
+
+    def __init__(self, name):
+        self.name = name
+        self.reading = None  # Newest reading received
+        self._on_reading = None
+        self._stop = threading.Event()
+
+    def get_current_glucose_reading(self):
+        reading = self.reading
+        if reading is None or time.time() - reading.datetime.timestamp() > MAX_AGE:
+            return None
+        return reading
+
+    def start(self, on_reading):
+        """Call on_reading(reading) from a background thread for every new reading."""
+        self._on_reading = on_reading
+        threading.Thread(target=self._run, name=f"{type(self).__name__}-{self.name}", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    @abstractmethod
+    def _run(self):
+        """Receive readings, passing them to _received(), until stop() is called."""
+
+    def _received(self, reading):
+        """Keep and pass on a reading if it is newer than the last one."""
+        if self.reading is not None and reading.datetime <= self.reading.datetime:
+            return
+        self.reading = reading
+        if self._on_reading:
+            self._on_reading(reading)
+
+    def _lines(self, lines):
+        """Pass on the newest reading among JSON feed lines."""
+        newest = None
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                reading = parse_reading(json.loads(line), time.time())
+            except Exception as e:
+                print(f"Bad reading in feed ({self.name}): {line[:80]!r}: {e}")
+                continue
+            if newest is None or reading.datetime > newest.datetime:
+                newest = reading
+        if newest is not None:
+            self._received(newest)
+
+
+class NightscoutSource(PushSource):
+    """Nightscout: readings pushed over its socket.io WebSocket, with the REST API for polls.
+
+    Speaks Engine.IO 4 (Nightscout 15 and later). The stream reconnects with
+    backoff when it drops.
+    """
+
+    def __init__(self, name, url, token=None, api_secret=None, timeout=10):
+        super().__init__(name)
+        self.url = url.rstrip('/')
+        self.token = token
+        # Nightscout wants the SHA-1 of the API secret, never the secret itself
+        self.secret = hashlib.sha1(api_secret.encode()).hexdigest() if api_secret else None
+        self.timeout = timeout
+        self._sock = None
+        self._backoff = Backoff(1, 60)
+
+    def get_current_glucose_reading(self):
+        query = {'count': 1}
+        if self.token:
+            query['token'] = self.token
+        request = urllib.request.Request(f"{self.url}/api/v1/entries/sgv.json?{urllib.parse.urlencode(query)}")
+        if self.secret:
+            request.add_header('api-secret', self.secret)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            entries = load_json(response, self.timeout)
+
+        if entries:
+            reading = parse_reading(entries[0], time.time())
+            # Polls only fill in; new readings are passed on by the stream
+            if self.reading is None or reading.datetime > self.reading.datetime:
+                self.reading = reading
+        return super().get_current_glucose_reading()
+
+    def stop(self):
+        super().stop()
+        sock = self._sock
+        if sock:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._stream()
+            except (OSError, ValueError, websocket.WebSocketClosed) as e:
+                if not self._stop.is_set():
+                    print(f"Nightscout stream error ({self.name}): {e}")
+            self._stop.wait(self._backoff.next_delay())
+
+    def _stream(self):
+        parts = urllib.parse.urlsplit(self.url)
+        scheme = 'wss' if parts.scheme == 'https' else 'ws'
+        sock, rfile = websocket.connect(f"{scheme}://{parts.netloc}{parts.path}/socket.io/?EIO=4&transport=websocket", self.timeout)
+        self._sock = sock
+        send_lock = threading.Lock()
+
+        def send(payload, opcode=websocket.OP_TEXT):
+            with send_lock:
+                sock.sendall(websocket.encode_frame(payload, opcode, mask=True))
+
+        try:
+            while not self._stop.is_set():
+                _, payload = websocket.read_message(rfile, lambda payload: send(payload, websocket.OP_PONG))
+                self._packet(payload.decode(), send, sock)
+        finally:
+            self._sock = None
+            sock.close()
+
+    def _packet(self, packet, send, sock):
+        # Engine.IO packet type, then for messages ('4') the socket.io packet type
+        if packet.startswith('0'):
+            handshake = json.loads(packet[1:])
+            # The server pings every pingInterval; silence for longer than that means the connection is dead
+            sock.settimeout((handshake['pingInterval'] + handshake['pingTimeout']) / 1000)
+            send('40')
+        elif packet == '2':
+            send('3')
+        elif packet.startswith('40'):
+            authorize = {'client': 'web', 'history': 1}
+            if self.token:
+                authorize['token'] = self.token
+            if self.secret:
+                authorize['secret'] = self.secret
+            send('42' + json.dumps(['authorize', authorize]))
+            self._backoff.reset()
+        elif packet.startswith('41') or packet == '1':
+            raise websocket.WebSocketClosed("Nightscout closed the stream")
+        elif packet.startswith('42'):
+            event, *data = json.loads(packet[2:])
+            if event == 'dataUpdate' and data and data[0].get('sgvs'):
+                newest = max(data[0]['sgvs'], key=lambda sgv: sgv['mills'])
+                self._received(parse_reading(newest, time.time()))
+
+
+class FileFeed(PushSource):
+    """Readings appended to a file, one JSON object per line, picked up like tail -f.
+
+    The file may not exist yet, and may be truncated or replaced; it is then
+    read again from the top.
+    """
+
+    CHECK_INTERVAL = 0.2  # Seconds between looks at the file
+
+    def __init__(self, name, path):
+        super().__init__(name)
+        self.path = os.path.expanduser(path)
+
+    def _run(self):
+        f, inode, pending = None, None, b''
+        while not self._stop.is_set():
+            try:
+                if f is None:
+                    f = open(self.path, 'rb')
+                    inode, pending = os.fstat(f.fileno()).st_ino, b''
+                chunk = f.read()
+                if chunk:
+                    *lines, pending = (pending + chunk).split(b'\n')
+                    self._lines(lines)
+                    continue
+
+                info = os.stat(self.path)
+                if info.st_ino != inode or info.st_size < f.tell():
+                    f.close()
+                    f = None
+                    continue
+            except OSError:
+                if f:
+                    f.close()
+                    f = None
+            self._stop.wait(self.CHECK_INTERVAL)
+        if f:
+            f.close()
+
+
+class SocketFeed(PushSource):
+    """Listen on a UNIX socket for readings, one JSON object per line, from any number of writers.
+
+        echo '{"mmol": 3.1, "trend": "SingleDown"}' | nc -U /run/user/1000/glucoclock.sock
+
+    The socket is bound on the feed's own thread, and binding is retried with
+    backoff, so a bad path only fails this account.
+    """
+
+    def __init__(self, name, path):
+        super().__init__(name)
+        self.path = os.path.expanduser(path)
+        self.server = None
+        self.error = None  # Why the socket could not be bound, until it is
+        self._backoff = Backoff(1, 60)
+
+    def get_current_glucose_reading(self):
+        if self.error:
+            raise self.error
+        return super().get_current_glucose_reading()
+
+    def stop(self):
+        super().stop()
+        if self.server:
+            self.server.close()
+            self._unlink()
+
+    def _unlink(self):
+        """Remove a socket left at path, and nothing else that is there."""
+        try:
+            if stat.S_ISSOCK(os.lstat(self.path).st_mode):
+                os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _listen(self):
+        self._unlink()  # Left over from an earlier run
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(self.path)
+            server.listen()
+        except OSError:
+            server.close()
+            raise
+        server.settimeout(1)  # So stop() is noticed
+        return server
+
+    def _run(self):
+        while self.server is None and not self._stop.is_set():
+            try:
+                self.server = self._listen()
+                self.error = None
+            except OSError as e:
+                print(f"Cannot listen on {self.path} ({self.name}): {e}")
+                self.error = e
+                self._stop.wait(self._backoff.next_delay())
+
+        while not self._stop.is_set():
+            try:
+                connection, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._read, args=(connection,), name=f"SocketFeed-{self.name}-reader", daemon=True).start()
+
+    def _read(self, connection):
+        with connection, connection.makefile('rb') as lines:
+            for line in lines:
+                self._lines([line])
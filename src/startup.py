@@ -0,0 +1,66 @@
+import json
+import os
+import time
+
+
+class StartupTimer:
+    """Collect how long each startup phase takes and print a breakdown."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last = self.started
+        self.phases = []
+
+    def mark(self, phase):
+        """End the current phase under the given name."""
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+    def total(self):
+        """Seconds from start to the last mark."""
+        return self._last - self.started
+
+    def report(self):
+        for phase, seconds in self.phases:
+            print(f"Startup {phase:<12} {seconds * 1000:7.1f} ms")
+        print(f"Startup {'total':<12} {self.total() * 1000:7.1f} ms")
+
+
+def resolve_font_families(preferences, cache_path):
+    """Pick the first installed family for each entry in preferences.
+
+    preferences maps a name to a list of families in order of preference; the
+    last one is the fallback. Results are cached in cache_path, so
+    tkFont.families() is only walked when the preferences change.
+    """
+    try:
+        with open(cache_path, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        cached = {}
+
+    if all(cached.get(name, {}).get('preferred') == preferred for name, preferred in preferences.items()):
+        return {name: cached[name]['family'] for name in preferences}
+
+    import tkinter.font as tkFont
+    available_fonts = set(tkFont.families())
+
+    def get_font_family(preferred_fonts):
+        for font in preferred_fonts:
+            if font in available_fonts:
+                return font
+        return preferred_fonts[-1]  # Return last as fallback
+
+    cached = {
+        name: {'preferred': preferred, 'family': get_font_family(preferred)}
+        for name, preferred in preferences.items()
+    }
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w') as f:
+            json.dump(cached, f)
+    except OSError as e:
+        print(f"Could not cache fonts: {e}")
+
+    return {name: cached[name]['family'] for name in preferences}
@@ -0,0 +1,106 @@
+import math
+import threading
+from collections import deque
+
+
+LOW, IN_RANGE, HIGH = 0, 1, 2
+
+
+MG_DL_PER_MMOL_L = 18.018
+
+
+def gmi(mean_mmol):
+    """Glucose management indicator (estimated HbA1c) in % from mean glucose in mmol/L."""
+    return 3.31 + 0.02392 * mean_mmol * MG_DL_PER_MMOL_L
+
+
+def gmi_mmol_mol(mean_mmol):
+    """Glucose management indicator in mmol/mol (IFCC) from mean glucose in mmol/L."""
+    return 12.71 + 4.70587 * mean_mmol
+
+
+class RollingStats:
+    """Time in range, mean, GMI and CV over the readings of the last window seconds.
+
+    Keeps running sums that each new reading adds to and each expired
+    reading takes off again, so updates cost O(1) however long the window
+    is. Values are summed as integer tenths of mmol/L, so taking readings
+    off leaves no floating point drift behind. Readings are banded against
+    the thresholds when added; rebuild() re-bands them after a change.
+    """
+
+    def __init__(self, window, low_threshold, high_threshold):
+        self.window = window
+        self.low_threshold = low_threshold
+        self.high_threshold = high_threshold
+        self.samples = deque()  # (ts, tenths, band), oldest first
+        self.total = 0
+        self.total_squares = 0
+        self.bands = [0, 0, 0]
+        self._lock = threading.Lock()  # Summaries are also read from server threads
+
+    def _band(self, mmol):
+        # Same bands as the glucose symbol colors
+        if mmol < self.low_threshold:
+            return LOW
+        if mmol < self.high_threshold:
+            return IN_RANGE
+        return HIGH
+
+    def add(self, ts, mmol):
+        """Add a reading newer than the ones added before, and expire what fell out of the window."""
+        tenths = round(mmol * 10)
+        band = self._band(mmol)
+        with self._lock:
+            self.samples.append((ts, tenths, band))
+            self.total += tenths
+            self.total_squares += tenths * tenths
+            self.bands[band] += 1
+            self._expire(ts)
+
+    def _expire(self, now):
+        cutoff = now - self.window
+        while self.samples and self.samples[0][0] <= cutoff:
+            _, tenths, band = self.samples.popleft()
+            self.total -= tenths
+            self.total_squares -= tenths * tenths
+            self.bands[band] -= 1
+
+    def rebuild(self, low_threshold, high_threshold):
+        """Band every reading again against new thresholds."""
+        with self._lock:
+            self.low_threshold = low_threshold
+            self.high_threshold = high_threshold
+            self.bands = [0, 0, 0]
+            samples = deque()
+            for ts, tenths, _ in self.samples:
+                band = self._band(tenths / 10)
+                samples.append((ts, tenths, band))
+                self.bands[band] += 1
+            self.samples = samples
+
+    def summary(self, now):
+        """Statistics of the readings in the window ending at now, or None without readings.
+
+        Percentages are of the readings, mean in mmol/L, GMI in % and
+        mmol/mol, and CV in %.
+        """
+        with self._lock:
+            self._expire(now)
+            count = len(self.samples)
+            if not count:
+                return None
+            mean = self.total / count
+            variance = max(0, self.total_squares / count - mean * mean)
+            low, in_range, high = self.bands
+
+        return {
+            'readings': count,
+            'mean': round(mean / 10, 1),
+            'gmi': round(gmi(mean / 10), 1),
+            'gmi_mmol_mol': round(gmi_mmol_mol(mean / 10)),
+            'cv': round(100 * math.sqrt(variance) / mean, 1) if mean else 0.0,
+            'low': round(100 * low / count, 1),
+            'in_range': round(100 * in_range / count, 1),
+            'high': round(100 * high / count, 1),
+        }
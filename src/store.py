@@ -0,0 +1,115 @@
+import os
+import queue
+import sqlite3
+import threading
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS readings (
+    account TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    mmol REAL NOT NULL,
+    trend INTEGER NOT NULL,
+    PRIMARY KEY (account, ts)
+) WITHOUT ROWID
+"""
+
+
+class ReadingStore:
+    """Glucose readings kept in a local SQLite database, so a restart can show them at once.
+
+    Readings are keyed by (account, ts), so the primary key doubles as the
+    index for time range queries. Writes go through a queue to a writer
+    thread that commits them in batches; every thread that reads gets its
+    own connection.
+    """
+
+    COMMIT_DELAY = 1.0  # Seconds to gather more readings before committing
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self._local = threading.local()
+        self.db.execute(SCHEMA)
+        self.db.commit()
+
+        self._rows = queue.Queue()
+        self._writer = threading.Thread(target=self._write, name="ReadingStore", daemon=True)
+        self._writer.start()
+
+    @property
+    def db(self):
+        """This thread's connection, for reading."""
+        if not hasattr(self._local, 'db'):
+            self._local.db = self._connect()
+        return self._local.db
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")  # Durable enough in WAL mode, fsyncs only on checkpoint
+        return db
+
+    def add(self, account, ts, mmol, trend):
+        """Queue a reading; ts is epoch seconds. Readings already stored are ignored."""
+        self._rows.put((account, int(ts), float(mmol), int(trend)))
+
+    def insert(self, rows):
+        """Store (account, ts, mmol, trend) rows right away on this thread, for bulk imports."""
+        with self.db:
+            self.db.executemany("INSERT OR IGNORE INTO readings VALUES (?, ?, ?, ?)", rows)
+
+    def flush(self):
+        """Wait until every queued reading is committed."""
+        done = threading.Event()
+        self._rows.put(done)
+        done.wait()
+
+    def close(self):
+        """Commit queued readings and close the database."""
+        self._rows.put(None)
+        self._writer.join()
+        self.db.close()
+
+    def latest(self, account):
+        """(ts, mmol, trend) of the newest reading of account, or None."""
+        return self.db.execute(
+            "SELECT ts, mmol, trend FROM readings WHERE account = ? ORDER BY ts DESC LIMIT 1",
+            (account,)
+        ).fetchone()
+
+    def range(self, account, start, end=None):
+        """(ts, mmol, trend) rows of account with start <= ts < end, oldest first."""
+        if end is None:
+            end = 2**63 - 1
+        return self.db.execute(
+            "SELECT ts, mmol, trend FROM readings WHERE account = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            (account, int(start), int(end))
+        ).fetchall()
+
+    def _write(self):
+        db = self._connect()
+        while True:
+            batch = [self._rows.get()]
+
+            # Gather whatever else arrives shortly, one commit for the lot
+            while batch[-1] is not None and not isinstance(batch[-1], threading.Event):
+                try:
+                    batch.append(self._rows.get(timeout=self.COMMIT_DELAY))
+                except queue.Empty:
+                    break
+
+            rows = [row for row in batch if isinstance(row, tuple)]
+            if rows:
+                try:
+                    with db:
+                        db.executemany("INSERT OR IGNORE INTO readings VALUES (?, ?, ?, ?)", rows)
+                except sqlite3.Error as e:
+                    print(f"Error storing readings: {e}")
+
+            if batch[-1] is None:
+                db.close()
+                return
+            if isinstance(batch[-1], threading.Event):
+                batch[-1].set()
@@ -0,0 +1,81 @@
+import metrics
+import profiler
+from clock import SystemClock
+
+
+class Ticker:
+    """Run all periodic UI work from one Tk wakeup aligned to the wall clock.
+
+    Jobs are registered with a period in seconds and run on the first tick at
+    or after each multiple of that period. Normally the ticker wakes on every
+    second boundary; while slow_when() returns True it only wakes on minute
+    boundaries, so short-period jobs run once a minute. Boundaries are those
+    of clock, which defaults to the real time.
+    """
+
+    FAST_INTERVAL = 1
+    SLOW_INTERVAL = 60
+
+    def __init__(self, root, slow_when=None, clock=None):
+        self.root = root
+        self.clock = clock or SystemClock()
+        self.slow_when = slow_when
+        self.slow = False
+        self.jobs = []
+        self.lateness = 0.0  # Seconds the last tick woke up after its boundary
+        self._timer = None
+        self._due = None
+        self._ticking = False
+
+    def add(self, callback, period):
+        """Run callback every period seconds, starting at the first tick."""
+        self.jobs.append([callback, period, 0])
+
+    def start(self):
+        self._tick()
+
+    def refresh(self):
+        """Re-check slow_when now; wake up at once if the ticker has to speed up."""
+        # From a job: the running tick checks slow_when again before it schedules the next one
+        if self._ticking:
+            return
+        if self.slow and not self._wants_slow():
+            self.root.after_cancel(self._timer)
+            self._tick()
+
+    def _wants_slow(self):
+        return bool(self.slow_when and self.slow_when())
+
+    def _tick(self):
+        self._ticking = True
+        try:
+            self._run_jobs()
+        finally:
+            self._ticking = False
+
+        self.slow = self._wants_slow()
+        interval = self.SLOW_INTERVAL if self.slow else self.FAST_INTERVAL
+
+        # Wake just after the next boundary so the displayed time has already turned over
+        now = self.clock.time()
+        self._due = (now // interval + 1) * interval + 0.005
+        self._timer = self.root.after(int(self.clock.delay(self._due - now) * 1000), self._tick)
+
+    def _run_jobs(self):
+        now = self.clock.time()
+        if self._due is not None:
+            self.lateness = max(0.0, now - self._due)
+            metrics.tick_lateness_seconds.observe(self.lateness)
+
+        for job in self.jobs:
+            callback, period, next_run = job
+            if now >= next_run:
+                job[2] = (now // period + 1) * period
+                # One failing job must not stop the clock or the alarms
+                try:
+                    if profiler.active:
+                        profiler.active.call(profiler.callback_name(callback), 'tick', self.lateness, callback)
+                    else:
+                        callback()
+                except Exception as e:
+                    print(f"Error in {profiler.callback_name(callback)}: {e}")
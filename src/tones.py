@@ -0,0 +1,64 @@
+import os
+
+import numpy as np
+import pygame
+
+
+def render_tone(frequency, sweep, duration, sample_rate):
+    """int16 mono samples of a sine going linearly from frequency to frequency + sweep."""
+    t = np.arange(int(sample_rate * duration)) / sample_rate
+
+    # Phase of a linear frequency sweep, integrated in closed form
+    phase = 2 * np.pi * (frequency * t + sweep * t * t / (2 * duration))
+
+    return (np.sin(phase) * 32767).astype(np.int16)
+
+
+class ToneBank:
+    """Alarm tones rendered once, cached on disk and handed to pygame as raw samples.
+
+    The cache key is (frequency, sweep, duration, sample rate), so after the
+    first run startup only loads the samples instead of synthesizing them.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.sample_rate, _, self.channels = pygame.mixer.get_init()
+        self.sounds = {}
+
+    def get(self, frequency, sweep, duration):
+        """pygame Sound for the tone, rendered or loaded on first use."""
+        key = (frequency, sweep, duration, self.sample_rate)
+        if key not in self.sounds:
+            samples = self._load(key)
+            if samples is None:
+                samples = render_tone(*key)
+                self._save(key, samples)
+
+            # Mixer frames are interleaved channels, fill them straight from the mono samples
+            frames = np.empty((len(samples), self.channels), dtype=np.int16)
+            frames[:] = samples[:, np.newaxis]
+            self.sounds[key] = pygame.mixer.Sound(buffer=frames)
+        return self.sounds[key]
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, "tone_{}_{}_{}_{}.npy".format(*key))
+
+    def _load(self, key):
+        try:
+            samples = np.load(self._path(key))
+        except (OSError, ValueError):
+            return None
+        if samples.dtype != np.int16 or samples.ndim != 1:
+            return None
+        return samples
+
+    def _save(self, key, samples):
+        path = self._path(key)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(path + '.tmp', 'wb') as f:
+                np.save(f, samples)
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Could not cache tone: {e}")
@@ -0,0 +1,153 @@
+"""Just enough of RFC 6455 WebSockets for pushing small JSON messages."""
+
+import base64
+import hashlib
+import os
+import socket
+import ssl
+import struct
+import urllib.parse
+
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+class WebSocketClosed(Exception):
+    pass
+
+
+def accept_key(key):
+    """Sec-WebSocket-Accept value for a client's Sec-WebSocket-Key."""
+    digest = hashlib.sha1((key.strip() + GUID).encode()).digest()
+    return base64.b64encode(digest).decode()
+
+
+def new_key():
+    """A random Sec-WebSocket-Key for a client handshake."""
+    return base64.b64encode(os.urandom(16)).decode()
+
+
+def connect(url, timeout=10, headers=None):
+    """Open a ws:// or wss:// URL. Returns the socket and a binary file to read_message() from."""
+    parts = urllib.parse.urlsplit(url)
+    secure = parts.scheme in ('wss', 'https')
+    sock = socket.create_connection((parts.hostname, parts.port or (443 if secure else 80)), timeout)
+    try:
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parts.hostname)
+
+        key = new_key()
+        path = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+        lines = [
+            f"GET {path} HTTP/1.1",
+            f"Host: {parts.netloc}",
+            "Upgrade: websocket",
+            "Connection: Upgrade",
+            f"Sec-WebSocket-Key: {key}",
+            "Sec-WebSocket-Version: 13",
+        ] + [f"{name}: {value}" for name, value in (headers or {}).items()]
+        sock.sendall(("\r\n".join(lines) + "\r\n\r\n").encode())
+
+        rfile = sock.makefile('rb')
+        status = rfile.readline()
+        response_headers = {}
+        while True:
+            line = rfile.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if status.split()[1:2] != [b'101']:
+            raise WebSocketClosed(f"upgrade refused: {status.decode('latin-1').strip()}")
+        if response_headers.get('sec-websocket-accept') != accept_key(key):
+            raise WebSocketClosed("bad Sec-WebSocket-Accept")
+        return sock, rfile
+    except BaseException:
+        sock.close()
+        raise
+
+
+def encode_frame(payload, opcode=OP_TEXT, mask=False):
+    """One unfragmented frame. Clients must mask their frames, servers must not."""
+    if isinstance(payload, str):
+        payload = payload.encode()
+
+    header = bytes([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header += bytes([mask_bit | length])
+    elif length < 2**16:
+        header += bytes([mask_bit | 126]) + struct.pack('!H', length)
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack('!Q', length)
+
+    if mask:
+        masking_key = os.urandom(4)
+        payload = _apply_mask(payload, masking_key)
+        header += masking_key
+    return header + payload
+
+
+def read_frame(rfile):
+    """(fin, opcode, payload) of the next frame from a binary file-like object."""
+    head = _read_exactly(rfile, 2)
+    fin = bool(head[0] & 0x80)
+    opcode = head[0] & 0x0F
+    masked = head[1] & 0x80
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', _read_exactly(rfile, 2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', _read_exactly(rfile, 8))[0]
+
+    masking_key = _read_exactly(rfile, 4) if masked else None
+    payload = _read_exactly(rfile, length)
+    if masking_key:
+        payload = _apply_mask(payload, masking_key)
+    return fin, opcode, payload
+
+
+def read_message(rfile, send_pong):
+    """(opcode, payload) of the next whole data message, joining fragments.
+
+    Pings are answered through send_pong(payload) and pongs skipped on the
+    way; a close frame raises WebSocketClosed.
+    """
+    opcode, parts = None, []
+    while True:
+        fin, frame_opcode, payload = read_frame(rfile)
+        if frame_opcode == OP_CLOSE:
+            raise WebSocketClosed(payload[2:].decode(errors='replace'))
+        if frame_opcode == OP_PING:
+            send_pong(payload)
+            continue
+        if frame_opcode == OP_PONG:
+            continue
+
+        if frame_opcode != OP_CONTINUATION:
+            opcode = frame_opcode
+        parts.append(payload)
+        if fin:
+            return opcode, b''.join(parts)
+
+
+def _read_exactly(rfile, count):
+    data = rfile.read(count)
+    if len(data) < count:
+        raise WebSocketClosed("connection closed")
+    return data
+
+
+def _apply_mask(payload, masking_key):
+    # XOR with the repeated key, done on whole integers instead of byte by byte
+    repeated = (masking_key * (len(payload) // 4 + 1))[:len(payload)]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(len(payload), 'big')